@@ -0,0 +1,165 @@
+"""Storage and query speed of the columnar archive against the listings table.
+
+    python -m benchmarks.archive_bench --games 2000 --listings-per-day 1500
+
+Fills a throwaway database with a synthetic year of listings, measures it (after VACUUM) and
+the per-game analytics queries in SQL, then compacts everything into the archive and runs the
+same queries there. Results are checked against each other before timings are reported.
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+DRMS = ["Steam", "GOG", "Epic Games", "Ubisoft Connect", "EA App", "Xbox", "Rockstar"]
+
+SQL_QUERIES = {
+    "average": "SELECT AVG(price) FROM listings WHERE game_id = ?",
+    "minimum": "SELECT MIN(price) FROM listings WHERE game_id = ?",
+    "percentile": "SELECT price FROM listings WHERE game_id = ?",
+    "last_prices": "SELECT price, created_at FROM listings WHERE game_id = ? ORDER BY created_at DESC, id DESC LIMIT 10",
+}
+
+
+def generate_listings(games, listings_per_day, days, seed):
+    """Rows for the listings table: a base price per game with noisy, occasionally discounted listings."""
+    rng = random.Random(seed)
+    base_prices = {f"{100000 + game}": rng.uniform(5, 300) for game in range(games)}
+    game_ids = list(base_prices)
+    start = datetime.now() - timedelta(days=days + 1)
+    rows = []
+    for index in range(listings_per_day * days):
+        game_id = rng.choice(game_ids)
+        discount = rng.uniform(0.3, 0.7) if rng.random() < 0.05 else rng.uniform(0.85, 1.15)
+        created_at = start + timedelta(seconds=index * 86400 / listings_per_day)
+        rows.append((
+            game_id, f"Game {game_id}", rng.choice(DRMS), round(base_prices[game_id] * discount, 2),
+            created_at.strftime("%Y-%m-%d %H:%M:%S"), f"https://gg.deals/game/{game_id}/"
+        ))
+    return rows
+
+
+def time_queries(run_query, game_ids):
+    """Median seconds per call of every query over the sampled games, and their results."""
+    timings, results = {}, {}
+    for name in SQL_QUERIES:
+        samples = []
+        for game_id in game_ids:
+            started = time.perf_counter()
+            results[(name, game_id)] = run_query(name, game_id)
+            samples.append(time.perf_counter() - started)
+        timings[name] = statistics.median(samples)
+    return timings, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the columnar archive with the listings table.")
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--listings-per-day", type=int, default=1500)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--queries", type=int, default=300, help="games sampled for the query timings")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="gg-archive-") as work_dir:
+        os.environ["DB_FILE"] = os.path.join(work_dir, "archive_bench.db")
+        os.environ["ARCHIVE_DIR"] = os.path.join(work_dir, "archive")
+        os.environ["LOG_FILE"] = os.path.join(work_dir, "main.log")
+        import numpy as np
+        from modules.archive import compact_listings, open_archive
+        from modules.database import INSERT_LISTING, get_connection, initialize_database, close_database
+
+        initialize_database()
+        conn = get_connection()
+        rows = generate_listings(args.games, args.listings_per_day, args.days, args.seed)
+        with conn:
+            conn.executemany(INSERT_LISTING, rows)
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        sqlite_bytes = os.path.getsize(os.environ["DB_FILE"])
+        listings_bytes = conn.execute(
+            "SELECT SUM(pgsize) FROM dbstat WHERE name IN ('listings', 'idx_listings_game_drm_created')"
+        ).fetchone()[0] if _has_dbstat(conn) else None
+
+        sample = random.Random(args.seed).sample(sorted({row[0] for row in rows}), args.queries)
+
+        def run_sql(name, game_id):
+            result = conn.execute(SQL_QUERIES[name], (game_id,)).fetchall()
+            if name == "percentile":
+                return float(np.percentile([price for price, in result], 10))
+            if name == "last_prices":
+                return result
+            return result[0][0]
+
+        sql_timings, sql_results = time_queries(run_sql, sample)
+
+        started = time.perf_counter()
+        archived = compact_listings(0)
+        compaction_seconds = time.perf_counter() - started
+        reader = open_archive()
+        archive_bytes = sum(os.path.getsize(os.path.join(reader.path, name)) for name in os.listdir(reader.path))
+
+        def run_archive(name, game_id):
+            if name == "percentile":
+                return reader.percentile(game_id, 10)
+            return getattr(reader, name)(game_id)
+
+        archive_timings, archive_results = time_queries(run_archive, sample)
+        close_database()
+
+    # float32 prices round-trip to within a grosz of the stored values
+    mismatches = sum(
+        1 for key, expected in sql_results.items()
+        if not _matches(expected, archive_results[key])
+    )
+
+    print(json.dumps({
+        "listings": len(rows),
+        "archived": archived,
+        "sqlite_bytes": sqlite_bytes,
+        "listings_table_and_index_bytes": listings_bytes,
+        "archive_bytes": archive_bytes,
+        "size_reduction": round(sqlite_bytes / archive_bytes, 1),
+        "compaction_seconds": round(compaction_seconds, 2),
+        "queries": {
+            name: {
+                "sql_us": round(sql_timings[name] * 1e6, 1),
+                "archive_us": round(archive_timings[name] * 1e6, 1),
+                "speedup": round(sql_timings[name] / archive_timings[name], 1),
+            }
+            for name in SQL_QUERIES
+        },
+        "mismatches": mismatches,
+    }, indent=2))
+    if mismatches:
+        sys.exit(1)
+
+
+def _has_dbstat(conn):
+    try:
+        conn.execute("SELECT 1 FROM dbstat LIMIT 1")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def _matches(expected, actual):
+    if isinstance(expected, list):
+        return len(expected) == len(actual) and all(
+            abs(price - archived_price) < 0.01 and created_at == archived_at
+            for (price, created_at), (archived_price, archived_at) in zip(expected, actual)
+        )
+    return abs(expected - actual) < 0.01 * max(1.0, abs(expected))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Listing inserts/sec and event-loop stalls, per-insert connections vs. the background writer.
+
+    python -m benchmarks.db_write_bench --listings 2000
+
+"before" is the original save_to_database (open a connection, insert, commit and close for
+every listing, on the event loop); "after" is the current queue + writer thread. A ticker
+coroutine measures how late the event loop wakes it while listings are being saved the way
+the store stage does it.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+TICK_SECONDS = 0.001
+
+
+# Original Write Path
+def legacy_initialize_database(db_file):
+    conn = sqlite3.connect(db_file)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS listings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            game_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            drm TEXT NOT NULL,
+            price REAL NOT NULL,
+            created_at TEXT NOT NULL,
+            url TEXT NOT NULL
+        )
+    """)
+    conn.commit()
+    conn.close()
+
+
+def legacy_save_to_database(db_file, game_id, name, drm, price, url):
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    cursor.execute("""
+        INSERT INTO listings (game_id, name, drm, price, created_at, url)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (game_id, name, drm, price, created_at, url))
+    conn.commit()
+    conn.close()
+
+
+# Measurement
+async def measure(save, flush, listings, batch_size):
+    """Save `listings` rows in store-stage sized batches; returns (inserts/sec, max and total loop lag)."""
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            expected = time.perf_counter() + TICK_SECONDS
+            await asyncio.sleep(TICK_SECONDS)
+            lags.append(max(0.0, time.perf_counter() - expected))
+
+    ticking = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    started = time.perf_counter()
+    for start in range(0, listings, batch_size):
+        for number in range(start, min(start + batch_size, listings)):
+            save(f"{100000 + number % 500}", f"Game {number}", "Steam", 10.0 + number % 50, f"https://gg.deals/game/{number}/")
+        await asyncio.sleep(0)  # The store stage yields between batches
+    await asyncio.to_thread(flush)
+    elapsed = time.perf_counter() - started
+    done.set()
+    await ticking
+    return {
+        "inserts_per_sec": round(listings / elapsed),
+        "max_loop_stall_ms": round(max(lags) * 1000, 2),
+        "total_loop_stall_ms": round(sum(lags) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare listing write throughput and event-loop stalls.")
+    parser.add_argument("--listings", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=100, help="listings per store-stage batch")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="gg-db-") as work_dir:
+        os.environ["DB_FILE"] = os.path.join(work_dir, "after.db")
+        os.environ["LOG_FILE"] = os.path.join(work_dir, "main.log")
+        from modules.database import close_database, flush_database, initialize_database, save_to_database
+
+        legacy_file = os.path.join(work_dir, "before.db")
+        legacy_initialize_database(legacy_file)
+        before = asyncio.run(measure(
+            lambda *row: legacy_save_to_database(legacy_file, *row), lambda: None, args.listings, args.batch_size
+        ))
+
+        initialize_database()
+        after = asyncio.run(measure(save_to_database, flush_database, args.listings, args.batch_size))
+        close_database()
+
+    print(json.dumps({"listings": args.listings, "before": before, "after": after,
+                      "speedup": round(after["inserts_per_sec"] / before["inserts_per_sec"], 1)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
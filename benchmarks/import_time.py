@@ -0,0 +1,75 @@
+"""Cold-import budget for the scanner.
+
+    python -m benchmarks.import_time --budget-ms 600
+
+Imports `scanner` in fresh interpreters from an empty working directory with no .env. The
+check fails (exit 1) when the median import takes longer than the budget, when pygame,
+Selenium or webdriver_manager get imported, or when the import writes any files.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only be imported when they are actually used
+LAZY_MODULES = ("pygame", "selenium", "webdriver_manager", "requests", "aiohttp.web")
+
+PROBE = f"""
+import json, os, sys, time
+started = time.perf_counter()
+import scanner
+elapsed = time.perf_counter() - started
+print(json.dumps({{
+    "seconds": elapsed,
+    "loaded": [name for name in {LAZY_MODULES!r} if name in sys.modules],
+    "files": os.listdir("."),
+}}))
+"""
+
+
+def measure(runs):
+    samples = []
+    env = {"PATH": os.environ.get("PATH", ""), "PYTHONPATH": REPO_ROOT}
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as work_dir:
+            output = subprocess.run(
+                [sys.executable, "-c", PROBE], cwd=work_dir, env=env,
+                capture_output=True, text=True, check=True
+            ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the scanner's cold-import time and side effects.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=600.0, help="maximum median import time")
+    args = parser.parse_args()
+
+    samples = measure(args.runs)
+    median_ms = statistics.median(sample["seconds"] for sample in samples) * 1000
+    loaded = sorted({name for sample in samples for name in sample["loaded"]})
+    files = sorted({name for sample in samples for name in sample["files"]})
+    print(json.dumps({"median_ms": round(median_ms, 1), "budget_ms": args.budget_ms,
+                      "eagerly_imported": loaded, "files_created": files}, indent=2))
+
+    failures = []
+    if median_ms > args.budget_ms:
+        failures.append(f"import took {median_ms:.0f} ms, budget is {args.budget_ms:.0f} ms")
+    if loaded:
+        failures.append(f"imported at import time: {', '.join(loaded)}")
+    if files:
+        failures.append(f"created at import time: {', '.join(files)}")
+    if failures:
+        print("Import check failed:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("Import check passed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import asyncio
+import hashlib
+import os
+import random
+import re
+import time
+from datetime import datetime, timezone
+from aiohttp import web
+from bs4 import BeautifulSoup, SoupStrainer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+LISTING_STRAINER = SoupStrainer("div", class_=re.compile(r"(^|\s)hoverable-box(\s|$)"))
+GAME_ID_ATTR = re.compile(r'data-container-game-id="([^"]*)"')
+FULL_LINK = re.compile(r'<a\b[^>]*\bclass="full-link"[^>]*>')
+HREF_ATTR = re.compile(r'href="([^"]*)"')
+DATETIME_ATTR = re.compile(r'datetime="[^"]*"')
+
+
+# Fixtures
+def load_listing_templates(fixtures_dir=FIXTURES_DIR):
+    """Cut the recorded list pages into per-listing blocks with placeholders for id, link and time."""
+    templates = []
+    list_dir = os.path.join(fixtures_dir, "list")
+    for file_name in sorted(os.listdir(list_dir)):
+        with open(os.path.join(list_dir, file_name), encoding="utf-8") as file:
+            soup = BeautifulSoup(file.read(), "html.parser", parse_only=LISTING_STRAINER)
+        for listing in soup.find_all("div", class_="hoverable-box"):
+            block = str(listing)
+            if not DATETIME_ATTR.search(block):
+                continue
+            block = GAME_ID_ATTR.sub(r'data-container-game-id="\1@@SUFFIX@@"', block)
+            block = FULL_LINK.sub(lambda link: HREF_ATTR.sub(r'href="\1?copy=@@COPY@@"', link.group(0)), block)
+            block = DATETIME_ATTR.sub('datetime="@@TIME@@"', block)
+            templates.append(block)
+    if not templates:
+        raise RuntimeError(f"No listings with a time found in {list_dir}")
+    return templates
+
+
+def load_keyshop_fixtures(fixtures_dir=FIXTURES_DIR):
+    """Return ({game_id: response body}, default body) from the recorded keyshop responses."""
+    keyshops = {}
+    keyshop_dir = os.path.join(fixtures_dir, "keyshops")
+    for file_name in os.listdir(keyshop_dir):
+        with open(os.path.join(keyshop_dir, file_name), "rb") as file:
+            keyshops[os.path.splitext(file_name)[0]] = file.read()
+    default = keyshops.pop("default", None) or next(iter(keyshops.values()))
+    return keyshops, default
+
+
+def fixture_drms(fixtures_dir=FIXTURES_DIR):
+    """DRM names that appear in the recorded list pages."""
+    drms = set()
+    for block in load_listing_templates(fixtures_dir):
+        drms.update(re.findall(r'title="A ([^"]+)"', block))
+    return sorted(drms)
+
+
+class MockGGDeals:
+    """Replays recorded gg.deals responses, publishing a new listing every `1 / arrival_rate` seconds.
+
+    Listings are cycled from the fixtures with unique ids, links and current times so the
+    scanner sees a live feed. Keyshop requests can be delayed, fail or be rate limited.
+    The webhook records when each listing's notification arrived.
+    """
+
+    def __init__(self, arrival_rate=2.0, latency=0.0, error_rate=0.0, rate_limit_rate=0.0,
+                 retry_after=1.0, page_size=60, fixtures_dir=FIXTURES_DIR, seed=None):
+        self.arrival_rate = arrival_rate
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.page_size = page_size
+        self.templates = load_listing_templates(fixtures_dir)
+        self.keyshops, self.default_keyshops = load_keyshop_fixtures(fixtures_dir)
+        self.random = random.Random(seed)
+
+        self.published = []        # (listing_url path, publish time, rendered block), oldest first
+        self.published_at = {}     # listing_url path -> publish time (wall clock)
+        self.notified_at = {}      # listing_url path -> first webhook arrival (wall clock)
+        self.requests = {"list": 0, "not_modified": 0, "keyshops": 0, "errors": 0, "rate_limited": 0, "webhook": 0}
+        self._started = None
+        self._runner = None
+
+    # Feed
+    def _publish_due(self):
+        """Publish every listing whose slot has passed since the server started."""
+        due = int((time.time() - self._started) * self.arrival_rate) + 1
+        while len(self.published) < due:
+            number = len(self.published)
+            copy = number // len(self.templates)
+            published_at = time.time()
+            listing_time = datetime.fromtimestamp(published_at, timezone.utc).isoformat()
+            block = (self.templates[number % len(self.templates)]
+                     .replace("@@SUFFIX@@", f"-{copy}" if copy else "")
+                     .replace("@@COPY@@", str(copy))
+                     .replace("@@TIME@@", listing_time))
+            path = HREF_ATTR.search(FULL_LINK.search(block).group(0)).group(1)
+            self.published.append((path, published_at, block))
+            self.published_at[path] = published_at
+
+    async def _delay(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    # Handlers
+    async def handle_home(self, request):
+        return web.Response(
+            text='<html><head><meta name="csrf-token" content="mock-token"></head></html>',
+            content_type="text/html",
+            headers={"Set-Cookie": "gg-session=mock-session; Max-Age=86400; Path=/"}
+        )
+
+    async def handle_list(self, request):
+        await self._delay()
+        self.requests["list"] += 1
+        self._publish_due()
+
+        page = int(request.query.get("page", 1))
+        newest_first = self.published[::-1]
+        blocks = [block for _, _, block in newest_first[(page - 1) * self.page_size:page * self.page_size]]
+        etag = '"' + hashlib.sha1(f"{len(self.published)}:{page}".encode()).hexdigest() + '"'
+        if request.headers.get("If-None-Match") == etag:
+            self.requests["not_modified"] += 1
+            return web.Response(status=304, headers={"ETag": etag})
+
+        body = "<html><body><div class=\"list-items\">" + "".join(blocks) + "</div></body></html>"
+        return web.Response(text=body, content_type="text/html", headers={"ETag": etag})
+
+    async def handle_keyshops(self, request):
+        await self._delay()
+        self.requests["keyshops"] += 1
+        roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            self.requests["rate_limited"] += 1
+            return web.Response(status=429, headers={"Retry-After": str(self.retry_after)})
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.requests["errors"] += 1
+            return web.Response(status=500)
+
+        game_id = request.match_info["game_id"].split("-")[0]
+        return web.Response(body=self.keyshops.get(game_id, self.default_keyshops), content_type="text/html")
+
+    async def handle_webhook(self, request):
+        self.requests["webhook"] += 1
+        received_at = time.time()
+        for embed in (await request.json()).get("embeds", []):
+            url = embed.get("url") or ""
+            path = url[url.find("/", url.find("//") + 2):] if "//" in url else url
+            self.notified_at.setdefault(path, received_at)
+        return web.Response(status=204)
+
+    # Results
+    def detect_to_notify(self):
+        """Seconds from publishing to notification for every notified listing."""
+        return [
+            notified_at - self.published_at[path]
+            for path, notified_at in self.notified_at.items() if path in self.published_at
+        ]
+
+    # Lifecycle
+    def make_app(self):
+        app = web.Application()
+        app.router.add_get("/", self.handle_home)
+        app.router.add_get("/deals/new-deals/", self.handle_list)
+        app.router.add_post("/pl/games/keyshopsDeals/{game_id}/", self.handle_keyshops)
+        app.router.add_post("/webhook", self.handle_webhook)
+        return app
+
+    async def start(self, host="127.0.0.1", port=8765):
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        self._started = time.time()
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve recorded gg.deals fixtures locally.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--arrival-rate", type=float, default=2.0, help="new listings per second")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of keyshop requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of keyshop requests answered with 429")
+    args = parser.parse_args()
+
+    async def serve():
+        server = MockGGDeals(args.arrival_rate, args.latency, args.error_rate, args.rate_limit_rate)
+        print(f"Serving fixtures on {await server.start(port=args.port)}")
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
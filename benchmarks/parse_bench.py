@@ -0,0 +1,131 @@
+"""Per-page parse time of the single-pass extractors against the original per-listing parsing.
+
+    python -m benchmarks.parse_bench --runs 50
+
+The legacy functions below are the original parsing path (one full-page soup plus two more
+soups per listing, and per keyshop offer); tests/test_extract.py checks both paths agree.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+os.environ.setdefault("BASE_URL", "https://gg.deals")
+
+from bs4 import BeautifulSoup
+from benchmarks.mock_server import FIXTURES_DIR
+
+USD_TO_PLN = 4.0
+
+
+# Original Parsing Path
+def legacy_extract_drm_from_listing(listing_html):
+    soup = BeautifulSoup(listing_html, 'html.parser')
+    drm_tag = soup.find("div", class_="tag-drm")
+    if drm_tag:
+        svg_tag = drm_tag.find("svg")
+        if svg_tag and "title" in svg_tag.attrs:
+            return svg_tag["title"].replace("A ", "").strip()
+    return None
+
+
+def legacy_extract_listing_details(listing_html, base_url):
+    soup = BeautifulSoup(listing_html, 'html.parser')
+    link_tag = soup.find("a", class_="full-link")
+    if link_tag:
+        game_name = link_tag.get("aria-label", "").replace("Go to: ", "").strip()
+        listing_url = base_url + link_tag.get("href", "")
+    else:
+        game_name = "Unknown Game"
+        listing_url = None
+    price = soup.find("div", class_="hoverable-box").get("da-value", None)
+    return game_name, listing_url, float(price) if price else None
+
+
+def legacy_extract_listings(html_content, usd_to_pln, base_url):
+    soup = BeautifulSoup(html_content, 'html.parser')
+    extracted_listings = []
+    for listing in soup.find_all('div', class_='hoverable-box'):
+        listing_html = str(listing)
+        game_id = listing.get('data-container-game-id')
+        drm = legacy_extract_drm_from_listing(listing_html)
+        game_name, listing_url, price = legacy_extract_listing_details(listing_html, base_url)
+        if not drm:
+            continue
+        time_tag = listing.find('time')
+        if not time_tag:
+            continue
+        listing_time = datetime.fromisoformat(time_tag['datetime']).astimezone(timezone.utc)
+        extracted_listings.append({
+            "game_id": game_id,
+            "game_name": game_name,
+            "listing_url": listing_url,
+            "current_price": price * usd_to_pln,
+            "listing_time": listing_time,
+            "drm": drm
+        })
+    return extracted_listings
+
+
+def legacy_extract_keyshops(html_content, listing_drm):
+    soup = BeautifulSoup(html_content, 'html.parser')
+    keyshops = []
+    for shop in soup.select('div[data-shops-names]'):
+        shop_name = shop.get('data-shops-names', '').lower()
+        price = shop.get('data-deals-value')
+        drm = legacy_extract_drm_from_listing(str(shop))
+        if not drm or drm != listing_drm:
+            continue
+        keyshops.append({"name": shop_name, "price": float(price), "drm": drm})
+    return keyshops
+
+
+# Fixtures
+def fixture_pages(kind):
+    directory = os.path.join(FIXTURES_DIR, kind)
+    pages = {}
+    for file_name in sorted(os.listdir(directory)):
+        with open(os.path.join(directory, file_name), "rb") as file:
+            pages[file_name] = file.read()
+    return pages
+
+
+def median_ms(func, args, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func(*args)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-page parse times on the saved fixtures.")
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--drm", default="Steam", help="DRM to filter keyshop offers by")
+    args = parser.parse_args()
+
+    from modules.config import BASE_URL
+    from modules.extract import extract_keyshops, extract_listings
+
+    results = {}
+    for name, html_content in fixture_pages("list").items():
+        legacy = median_ms(legacy_extract_listings, (html_content, USD_TO_PLN, BASE_URL), args.runs)
+        current = median_ms(extract_listings, (html_content, USD_TO_PLN), args.runs)
+        results[f"list/{name}"] = {"legacy_ms": round(legacy, 2), "single_pass_ms": round(current, 2),
+                                   "speedup": round(legacy / current, 1)}
+    for name, html_content in fixture_pages("keyshops").items():
+        legacy = median_ms(legacy_extract_keyshops, (html_content, args.drm), args.runs)
+        current = median_ms(extract_keyshops, (html_content, args.drm), args.runs)
+        results[f"keyshops/{name}"] = {"legacy_ms": round(legacy, 2), "single_pass_ms": round(current, 2),
+                                       "speedup": round(legacy / current, 1)}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
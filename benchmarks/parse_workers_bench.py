@@ -0,0 +1,88 @@
+"""Pages parsed per second with 1, 2, 4 and 8 parsing processes, against parsing inline.
+
+    python -m benchmarks.parse_workers_bench --pages 200
+
+Feeds the saved list and keyshop fixtures to parse_listings/parse_keyshops concurrently, the
+way the filter and keyshop stages call them, and measures throughput and how late a ticker
+coroutine is woken while they run. Pool start-up (spawning the workers) is reported apart.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+os.environ.setdefault("BASE_URL", "https://gg.deals")
+
+from benchmarks.parse_bench import USD_TO_PLN, fixture_pages
+
+TICK_SECONDS = 0.001
+
+
+async def parse_pages(pages, concurrency):
+    """Parse every page with at most `concurrency` in flight; returns (pages/sec, max loop stall ms)."""
+    from modules.extract import parse_keyshops, parse_listings
+
+    lags = []
+    done = asyncio.Event()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def ticker():
+        while not done.is_set():
+            expected = time.perf_counter() + TICK_SECONDS
+            await asyncio.sleep(TICK_SECONDS)
+            lags.append(max(0.0, time.perf_counter() - expected))
+
+    async def parse(kind, html_content):
+        async with semaphore:
+            if kind == "list":
+                await parse_listings(html_content, USD_TO_PLN)
+            else:
+                await parse_keyshops(html_content, "Steam")
+
+    ticking = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    await asyncio.gather(*(parse(kind, html_content) for kind, html_content in pages))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await ticking
+    return round(len(pages) / elapsed, 1), round(max(lags) * 1000, 1)
+
+
+async def _warm_up(parse_listings, html_content, workers):
+    await asyncio.gather(*(parse_listings(html_content, USD_TO_PLN) for _ in range(max(workers, 1))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare parse throughput across parsing pool sizes.")
+    parser.add_argument("--pages", type=int, default=200, help="pages parsed per pool size")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--concurrency", type=int, default=16, help="pages in flight at once")
+    args = parser.parse_args()
+
+    from modules.extract import parse_listings, shutdown_parse_executor, start_parse_executor
+
+    fixtures = [("list", page) for page in fixture_pages("list").values()] + \
+        [("keyshops", page) for page in fixture_pages("keyshops").values()]
+    pages = [fixtures[number % len(fixtures)] for number in range(args.pages)]
+
+    results = {"cpus": os.cpu_count()}
+    for workers in [0] + args.workers:
+        started = time.perf_counter()
+        start_parse_executor(workers)
+        # One parse per worker so every process is spawned and has imported the extractors
+        asyncio.run(asyncio.wait_for(_warm_up(parse_listings, fixtures[0][1], workers), timeout=120))
+        startup_ms = (time.perf_counter() - started) * 1000
+        pages_per_sec, max_stall_ms = asyncio.run(parse_pages(pages, args.concurrency))
+        shutdown_parse_executor()
+        results["inline" if workers == 0 else f"{workers}_workers"] = {
+            "pages_per_sec": pages_per_sec, "max_loop_stall_ms": max_stall_ms, "startup_ms": round(startup_ms)
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Keyshop lookups avoided by the bound pre-filter, and notifications it would have missed.
+
+    python -m benchmarks.prefilter_bench --hours 48 --listings-per-hour 200
+
+Replays listings cut from the recorded list page against keyshop prices taken from the recorded
+keyshop response, on a simulated clock. Each game gets its own keyshop price level, which
+drifts as a random walk, so a bound recorded earlier can be wrong by the time it is used. Every
+listing goes through the scanner's bounds, keyshop cache and profit stages twice: once with the
+pre-filter disabled (the reference) and once with it enabled.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import types
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.mock_server import FIXTURES_DIR, load_keyshop_fixtures
+from benchmarks.run import prepare_environment, quiet_logging
+
+
+class SimulatedClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+async def load_fixtures():
+    """Listings of the recorded list page and the marketplace prices (USD) of the recorded keyshop page."""
+    from modules.extract import parse_keyshops, parse_listings
+    from modules.tax_calculations import MARKETPLACE_SHOPS, get_exchange_rates
+
+    list_dir = os.path.join(FIXTURES_DIR, "list")
+    listings = []
+    for file_name in sorted(os.listdir(list_dir)):
+        with open(os.path.join(list_dir, file_name), "rb") as file:
+            listings.extend(await parse_listings(file.read(), get_exchange_rates()[1]))
+
+    _, keyshop_page = load_keyshop_fixtures()
+    prices = {}
+    for shop in await parse_keyshops(keyshop_page, listings[0]["drm"]):
+        prices.setdefault(shop["name"], shop["price"])
+    return listings, {shop: prices[shop] for shop in MARKETPLACE_SHOPS if shop in prices}
+
+
+async def replay(args):
+    with tempfile.TemporaryDirectory() as work_dir:
+        prepare_environment("http://127.0.0.1:1", work_dir)
+        from scanner import Scanner
+        from modules import keyshop_cache
+        quiet_logging()
+
+        clock = SimulatedClock()
+        keyshop_cache.time = types.SimpleNamespace(monotonic=clock.monotonic)
+
+        templates, marketplace_prices = await load_fixtures()
+        rng = random.Random(args.seed)
+
+        # Synthetic games built from the recorded listings, each with its own keyshop price level
+        games = []
+        for index in range(args.games):
+            template = templates[index % len(templates)]
+            games.append({
+                "game_id": f"{template['game_id']}-{index}",
+                "game_name": template["game_name"],
+                "drm": template["drm"],
+                "price": template["current_price"],
+                "listed_price": template["listed_price"],
+                "level": rng.uniform(0.3, 1.3),
+                "updated": 0.0,
+            })
+
+        scanners = {"reference": Scanner(), "prefilter": Scanner()}
+        for scanner in scanners.values():
+            if args.min_profit is not None:
+                scanner.min_profit = args.min_profit
+            if args.max_age is not None:
+                scanner.keyshop_bounds.max_age = args.max_age
+        scanners["reference"].keyshop_bounds.max_age = 0
+        fetches = {name: 0 for name in scanners}
+        notified = {name: set() for name in scanners}
+
+        def keyshop_prices(game):
+            # Random walk of the game's keyshop prices since the last time they were looked at
+            hours = (clock.now - game["updated"]) / 3600
+            game["level"] *= math.exp(rng.gauss(0, args.drift * math.sqrt(hours)))
+            game["updated"] = clock.now
+            return {shop: round(price * game["level"], 2) for shop, price in marketplace_prices.items()}
+
+        interval = 3600 / args.listings_per_hour
+        for event in range(int(args.hours * args.listings_per_hour)):
+            clock.now = event * interval
+            game = rng.choice(games)
+            listing = {
+                "game_id": game["game_id"], "game_name": game["game_name"], "drm": game["drm"],
+                "current_price": round(game["price"] * rng.uniform(0.8, 1.2), 2), "listing_url": f"/listing/{event}/",
+                "listed_price": game["listed_price"], "feed": "/deals/new-deals/",
+                "listing_time": datetime.fromtimestamp(clock.now, timezone.utc),
+            }
+            prices = keyshop_prices(game)
+
+            for name, scanner in scanners.items():
+                async def fetch_keyshops(game_id, drm, priority=1.0, name=name):
+                    fetches[name] += 1
+                    return {"kinguin_price": prices.get("kinguin"), "g2a_price": prices.get("g2a"), "prices": prices}
+
+                for candidate in await scanner.bound_listings([dict(listing)]):
+                    keyshop_data = await scanner.keyshop_cache.get_or_fetch(
+                        (candidate["game_id"], candidate["drm"]),
+                        lambda: scanner.fetch_and_record(fetch_keyshops, candidate["game_id"], candidate["drm"], 1.0)
+                    )
+                    for _, _, max_profit in await scanner.evaluate_listings([(candidate, keyshop_data)]):
+                        if max_profit >= scanner.min_profit:
+                            notified[name].add(event)
+
+        stats = scanners["prefilter"].keyshop_bounds.stats
+        return {
+            "listings": event + 1,
+            "games": args.games,
+            "min_profit": scanners["prefilter"].min_profit,
+            "bound_margin": scanners["prefilter"].bound_margin,
+            "bound_max_age": scanners["prefilter"].keyshop_bounds.max_age,
+            "fetches_reference": fetches["reference"],
+            "fetches_prefilter": fetches["prefilter"],
+            "fetches_avoided": round(1 - fetches["prefilter"] / fetches["reference"], 3),
+            "bounded_skips": stats["skipped"],
+            "forced_refreshes": stats["stale"],
+            "notifications_reference": len(notified["reference"]),
+            "notifications_prefilter": len(notified["prefilter"]),
+            "missed_notifications": len(notified["reference"] - notified["prefilter"]),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay fixtures through the keyshop bound pre-filter.")
+    parser.add_argument("--hours", type=float, default=48.0, help="simulated hours of listings")
+    parser.add_argument("--listings-per-hour", type=int, default=200)
+    parser.add_argument("--games", type=int, default=300)
+    parser.add_argument("--drift", type=float, default=0.03, help="hourly volatility of keyshop prices")
+    parser.add_argument("--min-profit", type=float, help="profit threshold (default: settings.ini)")
+    parser.add_argument("--max-age", type=int, help="seconds a bound is trusted (default: settings.ini)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    result = asyncio.run(replay(args))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
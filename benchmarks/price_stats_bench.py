@@ -0,0 +1,133 @@
+"""Notification price-history lookups on a large database: AVG + ORDER BY vs. price_stats.
+
+    python -m benchmarks.price_stats_bench --rows 2000000
+
+Builds a listings table the way the original schema did (no index), times the original
+average and last-10 queries, migrates the database, and times the same queries again with
+the index as well as the price_stats primary-key lookup. Results are checked to agree.
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+DRMS = ["Steam", "GOG", "Epic Games", "Ubisoft Connect", "EA App", "Xbox", "Rockstar"]
+
+LEGACY_AVERAGE = "SELECT AVG(price) FROM listings WHERE game_id = ? AND drm = ?"
+LEGACY_LAST_10 = "SELECT price, created_at FROM listings WHERE game_id = ? AND drm = ? ORDER BY created_at DESC LIMIT 10"
+
+
+def create_legacy_database(db_file, rows, games, seed):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_file)
+    conn.execute("""
+        CREATE TABLE listings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            game_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            drm TEXT NOT NULL,
+            price REAL NOT NULL,
+            created_at TEXT NOT NULL,
+            url TEXT NOT NULL
+        )
+    """)
+    start = datetime.now() - timedelta(days=365)
+    step = 365 * 86400 / rows
+
+    def generate():
+        for number in range(rows):
+            game = rng.randrange(games)
+            created_at = (start + timedelta(seconds=number * step)).strftime("%Y-%m-%d %H:%M:%S")
+            yield (f"{100000 + game}", f"Game {game}", DRMS[game % len(DRMS)], round(rng.uniform(5, 300), 2),
+                   created_at, f"https://gg.deals/game/{game}/")
+
+    with conn:
+        conn.executemany(
+            "INSERT INTO listings (game_id, name, drm, price, created_at, url) VALUES (?, ?, ?, ?, ?, ?)",
+            generate()
+        )
+    conn.close()
+
+
+def legacy_lookup(conn, game_id, drm):
+    average = conn.execute(LEGACY_AVERAGE, (game_id, drm)).fetchone()[0]
+    last_prices = conn.execute(LEGACY_LAST_10, (game_id, drm)).fetchall()
+    return average, last_prices
+
+
+def median_ms(lookup, keys):
+    samples, results = [], []
+    for game_id, drm in keys:
+        started = time.perf_counter()
+        results.append(lookup(game_id, drm))
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000, results
+
+
+def same_result(legacy, current):
+    (legacy_average, legacy_prices), (average, prices) = legacy, current
+    return abs(legacy_average - average) < 1e-6 and [created_at for _, created_at in legacy_prices] == \
+        [created_at for _, created_at in prices]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the price-history queries behind notifications.")
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--games", type=int, default=5000)
+    parser.add_argument("--lookups", type=int, default=30, help="games looked up (the unindexed queries are slow)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="gg-price-stats-") as work_dir:
+        db_file = os.path.join(work_dir, "price_stats_bench.db")
+        os.environ["DB_FILE"] = db_file
+        os.environ["LOG_FILE"] = os.path.join(work_dir, "main.log")
+        from modules.database import close_database, fetch_price_data, initialize_database
+
+        started = time.perf_counter()
+        create_legacy_database(db_file, args.rows, args.games, args.seed)
+        build_seconds = time.perf_counter() - started
+
+        rng = random.Random(args.seed)
+        keys = [(f"{100000 + game}", DRMS[game % len(DRMS)]) for game in rng.sample(range(args.games), args.lookups)]
+
+        conn = sqlite3.connect(db_file)
+        unindexed_ms, legacy_results = median_ms(lambda game_id, drm: legacy_lookup(conn, game_id, drm), keys)
+        conn.close()
+
+        started = time.perf_counter()
+        initialize_database()
+        migration_seconds = time.perf_counter() - started
+
+        conn = sqlite3.connect(db_file)
+        indexed_ms, _ = median_ms(lambda game_id, drm: legacy_lookup(conn, game_id, drm), keys)
+        conn.close()
+        price_stats_ms, current_results = median_ms(fetch_price_data, keys)
+        close_database()
+
+    mismatches = sum(1 for legacy, current in zip(legacy_results, current_results) if not same_result(legacy, current))
+    print(json.dumps({
+        "rows": args.rows,
+        "build_seconds": round(build_seconds, 1),
+        "migration_seconds": round(migration_seconds, 1),
+        "avg_and_last_10_unindexed_ms": round(unindexed_ms, 3),
+        "avg_and_last_10_indexed_ms": round(indexed_ms, 3),
+        "price_stats_lookup_ms": round(price_stats_ms, 3),
+        "speedup_vs_unindexed": round(unindexed_ms / price_stats_ms),
+        "mismatches": mismatches,
+    }, indent=2))
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
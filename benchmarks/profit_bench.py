@@ -0,0 +1,132 @@
+"""Profit evaluation of a batch of listings, per-(listing, shop) calls vs. calculate_profits.
+
+    python -m benchmarks.profit_bench --listings 10000 --shops 30
+
+"before" is the original path: one calculate_profit call per listing and marketplace, each
+looking the marketplace up in the fee table. "after" is one calculate_profits call over the
+whole batch with the fee arrays of the same synthetic table, timed with and without building
+the sell-price matrix from the keyshop offers. Results are checked to agree.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+os.environ.setdefault("BASE_URL", "https://gg.deals")
+
+import numpy as np
+
+EXCHANGE_RATES = (1.08, 4.0)
+
+
+# Original Profit Path
+def legacy_calculate_profit(price_zl, platform, exchange_rates, tax_settings):
+    eur_to_usd_rate, usd_to_pln_rate = exchange_rates
+    exchange_rate = eur_to_usd_rate * usd_to_pln_rate  # EUR to PLN
+
+    if platform not in tax_settings:
+        raise ValueError(f"Unknown platform: {platform}")
+
+    platform_tax = tax_settings[platform]
+    fixed_tax_pln = platform_tax["fixed_tax_eur"] * exchange_rate
+    variable_tax_pln = platform_tax["variable_tax"] * price_zl
+
+    profit = price_zl - fixed_tax_pln - variable_tax_pln
+    return profit
+
+
+def legacy_evaluate(buy_prices, offers, tax_settings):
+    """Max profit per listing, one scalar call per offer."""
+    best = []
+    for buy_price, listing_offers in zip(buy_prices, offers):
+        profits = [
+            legacy_calculate_profit(price, shop, EXCHANGE_RATES, tax_settings) - buy_price
+            for shop, price in listing_offers.items()
+        ]
+        best.append(max(profits) if profits else math.nan)
+    return best
+
+
+def sell_price_matrix(offers, tax_settings):
+    """One row per listing, one column per shop of the fee table, as evaluate_listings builds it."""
+    return np.array([[listing_offers.get(shop, np.nan) for shop in tax_settings] for listing_offers in offers])
+
+
+def batch_evaluate(buy_prices, offers, tax_settings, fees):
+    """Max profit per listing from one calculate_profits call."""
+    from modules.tax_calculations import calculate_profits
+
+    sell_prices = sell_price_matrix(offers, tax_settings)
+    profits = calculate_profits(buy_prices, sell_prices, EXCHANGE_RATES, fees)
+    return np.nanmax(np.where(np.isnan(profits), -np.inf, profits), axis=1)
+
+
+# Synthetic Batch
+def synthetic_batch(listings, shops, offer_ratio, seed):
+    rng = random.Random(seed)
+    tax_settings = {
+        f"Shop{number}": {"fixed_tax_eur": round(rng.uniform(0.0, 0.5), 2), "variable_tax": round(rng.uniform(0.05, 0.25), 2)}
+        for number in range(shops)
+    }
+    buy_prices = [round(rng.uniform(5, 300), 2) for _ in range(listings)]
+    offers = [
+        {shop: round(buy_price * rng.uniform(0.6, 1.6), 2) for shop in tax_settings if rng.random() < offer_ratio}
+        for buy_price in buy_prices
+    ]
+    return tax_settings, buy_prices, offers
+
+
+def median_ms(func, args, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = func(*args)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare scalar and batched profit evaluation.")
+    parser.add_argument("--listings", type=int, default=10_000)
+    parser.add_argument("--shops", type=int, default=30)
+    parser.add_argument("--offer-ratio", type=float, default=0.7, help="share of shops with an offer per listing")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    from modules.tax_calculations import calculate_profits, fee_arrays
+
+    tax_settings, buy_prices, offers = synthetic_batch(args.listings, args.shops, args.offer_ratio, args.seed)
+    fees = fee_arrays(tax_settings)
+
+    legacy_ms, legacy = median_ms(legacy_evaluate, (buy_prices, offers, tax_settings), args.runs)
+    batch_ms, batch = median_ms(batch_evaluate, (buy_prices, offers, tax_settings, fees), args.runs)
+    sell_prices = sell_price_matrix(offers, tax_settings)
+    profits_ms, _ = median_ms(calculate_profits, (buy_prices, sell_prices, EXCHANGE_RATES, fees), args.runs)
+
+    mismatches = sum(
+        1 for before, after in zip(legacy, batch)
+        if not (math.isnan(before) and math.isinf(after)) and abs(before - after) > 1e-6
+    )
+    print(json.dumps({
+        "listings": args.listings,
+        "shops": args.shops,
+        "scalar_ms": round(legacy_ms, 1),
+        "batch_with_matrix_ms": round(batch_ms, 1),
+        "calculate_profits_ms": round(profits_ms, 2),
+        "speedup_with_matrix": round(legacy_ms / batch_ms, 1),
+        "speedup_calculate_profits": round(legacy_ms / profits_ms),
+        "mismatches": mismatches,
+    }, indent=2))
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
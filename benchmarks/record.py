@@ -0,0 +1,69 @@
+"""Record live gg.deals responses as benchmark fixtures.
+
+    python -m benchmarks.record --pages 2 --keyshops 30
+
+Saves the new-deals list pages to fixtures/list/page_<n>.html and the keyshopsDeals response
+of each listed game to fixtures/keyshops/<game_id>.html. The mock server replays them.
+"""
+import argparse
+import asyncio
+import os
+import re
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+os.chdir(REPO_ROOT)
+
+from modules.config import BASE_URL
+from modules.get_cookies import get_session_credentials
+from modules.http_client import BROWSER_HEADERS, create_session, keyshop_headers
+from benchmarks.mock_server import FIXTURES_DIR
+
+GAME_ID_ATTR = re.compile(rb'data-container-game-id="([^"]+)"')
+
+
+def write_fixture(*parts, content):
+    path = os.path.join(FIXTURES_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(content)
+    return path
+
+
+async def record(pages, keyshop_limit, delay):
+    async with create_session() as session:
+        credentials = await get_session_credentials(session)
+        cookies = {"gg-session": credentials["gg_session"], "gg_csrf": credentials["gg_csrf"]}
+
+        game_ids = []
+        for page in range(1, pages + 1):
+            async with session.get(f"{BASE_URL}/deals/new-deals/?page={page}", headers=BROWSER_HEADERS) as response:
+                response.raise_for_status()
+                html_content = await response.read()
+            print(f"Recorded {write_fixture('list', f'page_{page}.html', content=html_content)}")
+            game_ids.extend(game_id.decode() for game_id in GAME_ID_ATTR.findall(html_content))
+
+        headers = keyshop_headers(credentials["csrf_token"])
+        for game_id in list(dict.fromkeys(game_ids))[:keyshop_limit]:
+            async with session.post(f"{BASE_URL}/pl/games/keyshopsDeals/{game_id}/", data={'gg_csrf': credentials["csrf_token"]},
+                                    headers=headers, cookies=cookies) as response:
+                if response.status != 200:
+                    print(f"Skipping game {game_id}: status {response.status}")
+                    continue
+                html_content = await response.read()
+            print(f"Recorded {write_fixture('keyshops', f'{game_id}.html', content=html_content)}")
+            await asyncio.sleep(delay)  # Be gentle with the live site
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record gg.deals responses as benchmark fixtures.")
+    parser.add_argument("--pages", type=int, default=1, help="number of list pages to record")
+    parser.add_argument("--keyshops", type=int, default=20, help="maximum number of keyshop responses to record")
+    parser.add_argument("--delay", type=float, default=1.0, help="seconds between keyshop requests")
+    args = parser.parse_args()
+    asyncio.run(record(args.pages, args.keyshops, args.delay))
+
+
+if __name__ == "__main__":
+    main()
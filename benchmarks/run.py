@@ -0,0 +1,192 @@
+"""End-to-end scanner benchmark against the local mock server.
+
+    python -m benchmarks.run --duration 30 --arrival-rate 5
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json   # exits 1 on a regression
+
+pygame is replaced by a silent stub, Selenium is never reached (a valid session file is written
+up front) and Discord is the mock server's webhook.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import types
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.mock_server import MockGGDeals, fixture_drms
+
+# Result keys compared in regression mode, and whether higher values are better
+REGRESSION_METRICS = {
+    "listings_per_sec": True,
+    "p50_detect_to_notify": False,
+    "p99_detect_to_notify": False,
+    "peak_rss_mb": False,
+}
+
+
+# Environment
+def stub_pygame():
+    """Replace pygame with a silent stand-in so no audio device is needed."""
+    pygame = types.ModuleType("pygame")
+    pygame.init = lambda: None
+    pygame.mixer = types.SimpleNamespace(Sound=lambda path: types.SimpleNamespace(play=lambda: None))
+    sys.modules["pygame"] = pygame
+
+
+def prepare_environment(base_url, work_dir):
+    """Point the scanner's .env settings at the mock server and throwaway files."""
+    rates_file = os.path.join(work_dir, "exchange_rates.json")
+    session_file = os.path.join(work_dir, "gg_session.json")
+    with open(rates_file, "w") as file:
+        json.dump({"last_updated": datetime.now().isoformat(), "eur_to_usd": 1.05, "usd_to_pln": 4.0}, file)
+    with open(session_file, "w") as file:
+        json.dump({"gg_session": "mock-session", "gg_csrf": "mock-csrf", "csrf_token": "mock-token",
+                   "expires_at": time.time() + 86400}, file)
+
+    os.environ.update({
+        "BASE_URL": base_url,
+        "DISCORD_WEBHOOK_URL": f"{base_url}/webhook",
+        "DB_FILE": os.path.join(work_dir, "benchmark.db"),
+        "LOG_FILE": os.path.join(work_dir, "main.log"),  # Inherited by the spawned workers too
+        "CACHE_FILE": rates_file,
+        "CACHE_DURATION_HOURS": "24",
+        "SESSION_FILE": session_file,
+        "NOTIFICATION_SOUND": "",
+        "ALLOWED_DRMS": ",".join(fixture_drms()),
+    })
+    os.chdir(REPO_ROOT)  # settings.ini is read relative to the working directory
+
+
+def quiet_logging():
+    for logger in list(logging.Logger.manager.loggerDict.values()):
+        if isinstance(logger, logging.Logger):
+            logger.setLevel(logging.WARNING)
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+# Benchmark
+async def run_benchmark(args):
+    server = MockGGDeals(args.arrival_rate, args.latency, args.error_rate, args.rate_limit_rate, seed=args.seed)
+    base_url = await server.start(port=args.port)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        prepare_environment(base_url, work_dir)
+        stub_pygame()
+
+        # Imported only now: the modules read their configuration at import time
+        from scanner import Scanner
+        from modules import http_client, metrics
+        from modules.adaptive_poll import AdaptiveInterval
+        from modules.database import initialize_database, close_database
+
+        if not args.verbose:
+            quiet_logging()
+
+        # Poll at a fixed interval and notify every listing, so each one has a detect-to-notify time
+        scanner = Scanner()
+        scanner.poll_interval = AdaptiveInterval(args.poll_interval, args.poll_interval, args.poll_interval, 0.0)
+        scanner.min_profit = float("-inf")
+        scanner.sound_profit = float("inf")
+        scanner.metrics_port = 0
+        scanner.keyshop_workers = args.workers
+
+        initialize_database()
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(scanner.run(), args.duration)
+        except asyncio.TimeoutError:
+            pass
+        elapsed = time.perf_counter() - started
+        close_database()
+        await server.stop()
+
+    latencies = sorted(server.detect_to_notify())
+    listings = metrics.COUNTERS.get("listings_new", 0)
+    iterations = metrics.COUNTERS.get("ticks_processed", 0) + metrics.COUNTERS.get("ticks_skipped", 0)
+    connections = http_client.stats
+    pooled = connections["connections_created"] + connections["connections_reused"]
+    return {
+        "duration": round(elapsed, 2),
+        "listings": listings,
+        "listings_per_sec": round(listings / elapsed, 2),
+        "notified": len(latencies),
+        "p50_detect_to_notify": round(percentile(latencies, 50), 3) if latencies else None,
+        "p99_detect_to_notify": round(percentile(latencies, 99), 3) if latencies else None,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "requests": server.requests,
+        "connections": {
+            "created": connections["connections_created"],
+            "reused": connections["connections_reused"],
+            "reuse_ratio": round(connections["connections_reused"] / pooled, 3) if pooled else None,
+            "tls_handshakes_per_iteration": round(connections["tls_handshakes"] / iterations, 2) if iterations else None,
+        },
+    }
+
+
+# Regression Mode
+def compare(result, baseline, tolerance):
+    """Return a description of every metric that is more than `tolerance` worse than the baseline."""
+    regressions = []
+    for key, higher_is_better in REGRESSION_METRICS.items():
+        current, previous = result.get(key), baseline.get(key)
+        if current is None or not previous:
+            continue
+        change = (current - previous) / previous
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append(f"{key}: {previous} -> {current} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scanner end to end against recorded fixtures.")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds to run the scanner")
+    parser.add_argument("--arrival-rate", type=float, default=5.0, help="new listings published per second")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="fixed list page poll interval in seconds")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds the mock adds to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of keyshop requests failing with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of keyshop requests answered with 429")
+    parser.add_argument("--workers", type=int, default=0, help="keyshop worker processes (0 fetches in-process)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--baseline", help="compare against this baseline JSON and exit 1 on a regression")
+    parser.add_argument("--save-baseline", help="write the results to this baseline JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression (default 20%%)")
+    parser.add_argument("--verbose", action="store_true", help="keep the scanner's INFO logging")
+    args = parser.parse_args()
+
+    result = asyncio.run(run_benchmark(args))
+    print(json.dumps(result, indent=2))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file:
+            json.dump(result, file, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(result, json.load(file), args.tolerance)
+        if regressions:
+            print("Regressions against baseline:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import statistics
+from collections import deque
+
+
+class AdaptiveInterval:
+    """Picks the next poll interval from an EWMA of the gaps between deal arrivals.
+
+    Polls roughly once per expected arrival while deals are flowing and backs off towards
+    `max_interval` when the feed goes quiet.
+    """
+
+    def __init__(self, initial_interval, min_interval, max_interval, alpha, detect_window=1000):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.alpha = alpha
+        self.mean_gap = float(initial_interval)  # seconds between arrivals
+        self._last_arrival = None
+        self._detect_latencies = deque(maxlen=detect_window)
+
+    def _update(self, gap):
+        # Gaps past max_interval poll no slower, and would only delay the speed-up when deals return
+        self.mean_gap += self.alpha * (min(gap, self.max_interval) - self.mean_gap)
+
+    def observe(self, listing_times, now):
+        """Feed the listing times first seen in this tick and the time they were detected."""
+        for listing_time in sorted(listing_times):
+            if self._last_arrival is not None and listing_time >= self._last_arrival:
+                self._update((listing_time - self._last_arrival).total_seconds())
+            if self._last_arrival is None or listing_time > self._last_arrival:
+                self._last_arrival = listing_time
+            self._detect_latencies.append((now - listing_time).total_seconds())
+
+        # While idle the current gap is at least the time since the last arrival
+        if self._last_arrival is not None:
+            quiet = (now - self._last_arrival).total_seconds()
+            if quiet > self.mean_gap:
+                self._update(quiet)
+
+    @property
+    def interval(self):
+        return min(self.max_interval, max(self.min_interval, self.mean_gap))
+
+    def sleep_time(self, iteration_seconds):
+        """Time left to sleep once the iteration itself has taken `iteration_seconds`."""
+        return max(0.0, self.interval - iteration_seconds)
+
+    def detect_percentiles(self):
+        """Return (p50, p90, p99) time-to-detect in seconds, or None before any detection."""
+        if len(self._detect_latencies) < 2:
+            return None
+        cuts = statistics.quantiles(self._detect_latencies, n=100, method="inclusive")
+        return cuts[49], cuts[89], cuts[98]
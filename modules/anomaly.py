@@ -0,0 +1,56 @@
+import math
+
+
+class PriceHistory:
+    """Running mean and variance of listed prices per (game_id, drm), updated in O(1) (Welford).
+
+    Lives in memory; the moments of keys changed since the last snapshot are handed out by
+    `take_snapshot()` so they can be persisted periodically.
+    """
+
+    def __init__(self, min_samples, zscore_threshold):
+        self.min_samples = max(2, min_samples)  # The variance needs two prices
+        self.zscore_threshold = zscore_threshold
+        self._moments = {}  # (game_id, drm) -> [count, mean, m2]
+        self._dirty = set()
+
+    def __len__(self):
+        return len(self._moments)
+
+    def load(self, rows):
+        """Restore moments from [(game_id, drm, count, mean, m2), ...]."""
+        for game_id, drm, count, mean, m2 in rows:
+            self._moments[(game_id, drm)] = [count, mean, m2]
+
+    def update(self, game_id, drm, price):
+        moments = self._moments.get((game_id, drm))
+        if moments is None:
+            moments = self._moments[(game_id, drm)] = [0, 0.0, 0.0]
+        moments[0] += 1
+        delta = price - moments[1]
+        moments[1] += delta / moments[0]
+        moments[2] += delta * (price - moments[1])
+        self._dirty.add((game_id, drm))
+
+    def mean(self, game_id, drm):
+        moments = self._moments.get((game_id, drm))
+        return moments[1] if moments else None
+
+    def zscore(self, game_id, drm, price):
+        """Standard deviations between `price` and the history's mean; None while the history is too short."""
+        moments = self._moments.get((game_id, drm))
+        if moments is None or moments[0] < self.min_samples:
+            return None
+        count, mean, m2 = moments
+        # A flat history would make any cent below it an anomaly, so the spread is at least 1% of the mean
+        std = max(math.sqrt(m2 / (count - 1)), 0.01 * mean)
+        return (price - mean) / std if std else None
+
+    def is_anomaly(self, zscore):
+        return zscore is not None and zscore <= -self.zscore_threshold
+
+    def take_snapshot(self):
+        """Moments changed since the previous snapshot, as rows for save_price_history."""
+        rows = [(game_id, drm, *self._moments[(game_id, drm)]) for game_id, drm in self._dirty]
+        self._dirty.clear()
+        return rows
@@ -0,0 +1,192 @@
+import asyncio
+import json
+import os
+import shutil
+import sqlite3
+import numpy as np
+from datetime import datetime, timedelta
+from modules.config import ARCHIVE_DIR, ARCHIVE_AFTER_DAYS
+from modules.database import get_connection
+from modules.logger import get_logger
+
+logger = get_logger('archive')
+
+# Column files of one archive version. Rows are sorted by (game, time) and game i owns rows
+# offsets[i]:offsets[i + 1], so a per-game query only touches its own slice of each column.
+COLUMNS = {
+    "drm": np.uint8,       # index into dictionary["drms"]
+    "time": np.uint32,     # epoch seconds of created_at
+    "price": np.float32,   # PLN
+}
+OFFSETS_FILE = "offsets.npy"
+DICTIONARY_FILE = "dictionary.json"
+CURRENT_FILE = "CURRENT"
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# How often the background archiver compacts old listings
+ARCHIVE_INTERVAL_SECONDS = 24 * 3600
+
+
+# Reading
+class ArchiveReader:
+    """Memory-mapped view of one archive version with per-game analytics."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, DICTIONARY_FILE)) as file:
+            dictionary = json.load(file)
+        self.game_ids = dictionary["game_ids"]
+        self.drms = dictionary["drms"]
+        # (last listing id, cutoff) of the rows moved into this version; None for versions written before it was kept
+        self.archived = dictionary.get("archived")
+        self.game_index = {game_id: index for index, game_id in enumerate(self.game_ids)}
+        self.drm_index = {drm: index for index, drm in enumerate(self.drms)}
+        self.offsets = np.load(os.path.join(path, OFFSETS_FILE))
+        self._columns = {}
+
+    def column(self, name):
+        """Open a column lazily as a read-only memory map."""
+        if name not in self._columns:
+            self._columns[name] = np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r")
+        return self._columns[name]
+
+    def __len__(self):
+        return int(self.offsets[-1]) if len(self.offsets) else 0
+
+    def _slice(self, game_id, drm, name):
+        """Values of column `name` for a game, optionally only those of one DRM."""
+        index = self.game_index.get(game_id)
+        if index is None or (drm is not None and drm not in self.drm_index):
+            return np.empty(0, dtype=COLUMNS[name])
+        start, end = self.offsets[index], self.offsets[index + 1]
+        values = self.column(name)[start:end]
+        if drm is not None:
+            values = values[self.column("drm")[start:end] == self.drm_index[drm]]
+        return values
+
+    def average(self, game_id, drm=None):
+        prices = self._slice(game_id, drm, "price")
+        return float(prices.mean(dtype=np.float64)) if len(prices) else None
+
+    def minimum(self, game_id, drm=None):
+        prices = self._slice(game_id, drm, "price")
+        return float(prices.min()) if len(prices) else None
+
+    def percentile(self, game_id, q, drm=None):
+        prices = self._slice(game_id, drm, "price")
+        return float(np.percentile(prices, q)) if len(prices) else None
+
+    def last_prices(self, game_id, n=10, drm=None):
+        """Most recent `n` prices as [(price, created_at), ...], newest first."""
+        prices = self._slice(game_id, drm, "price")[-n:][::-1]
+        times = self._slice(game_id, drm, "time")[-n:][::-1].astype("datetime64[s]").astype(str)
+        return [(float(price), created_at.replace("T", " ")) for price, created_at in zip(prices, times)]
+
+
+def open_archive(archive_dir=ARCHIVE_DIR):
+    """Return a reader for the current archive version, or None before the first compaction."""
+    try:
+        with open(os.path.join(archive_dir, CURRENT_FILE)) as file:
+            version = file.read().strip()
+    except FileNotFoundError:
+        return None
+    return ArchiveReader(os.path.join(archive_dir, version))
+
+
+# Compaction
+def _to_epoch(created_at):
+    """created_at strings to epoch seconds; they are naive, so they round-trip unchanged through UTC."""
+    return np.array(created_at, dtype="datetime64[s]").astype(np.int64).astype(np.uint32)
+
+
+def _write_version(archive_dir, version, game_ids, drms, game, drm, timestamp, price, archived):
+    order = np.lexsort((timestamp, game))
+    path = os.path.join(archive_dir, version)
+    os.makedirs(path)
+    np.save(os.path.join(path, OFFSETS_FILE), np.concatenate(([0], np.cumsum(np.bincount(game, minlength=len(game_ids))))))
+    np.save(os.path.join(path, "drm.npy"), drm[order].astype(COLUMNS["drm"]))
+    np.save(os.path.join(path, "time.npy"), timestamp[order].astype(COLUMNS["time"]))
+    np.save(os.path.join(path, "price.npy"), price[order].astype(COLUMNS["price"]))
+    with open(os.path.join(path, DICTIONARY_FILE), "w") as file:
+        json.dump({"game_ids": game_ids, "drms": drms, "archived": archived}, file)
+
+
+def compact_listings(older_than_days, archive_dir=ARCHIVE_DIR):
+    """Move listings older than `older_than_days` from the database into a new archive version.
+
+    The new version is written next to the current one and switched to atomically; price_stats
+    keeps covering the archived rows. Returns the number of rows archived.
+    """
+    cutoff = (datetime.now() - timedelta(days=older_than_days)).strftime(TIME_FORMAT)
+    conn = get_connection()
+
+    # Drop rows the current version already holds, in case the run that wrote it failed before deleting them
+    current = open_archive(archive_dir)
+    if current is not None and current.archived is not None:
+        with conn:
+            conn.execute("DELETE FROM listings WHERE id <= ? AND created_at < ?", current.archived)
+
+    rows = conn.execute(
+        "SELECT id, game_id, drm, price, created_at FROM listings WHERE created_at < ? ORDER BY id",
+        (cutoff,)
+    ).fetchall()
+    if not rows:
+        return 0
+
+    # Start from the current version, if any, and append the new rows
+    if current is not None and len(current):
+        game_ids, drms = list(current.game_ids), list(current.drms)
+        game = np.repeat(np.arange(len(game_ids)), np.diff(current.offsets))
+        drm = np.array(current.column("drm"), dtype=np.int64)
+        timestamp = np.array(current.column("time"), dtype=np.int64)
+        price = np.array(current.column("price"), dtype=np.float64)
+    else:
+        game_ids, drms = [], []
+        game = drm = timestamp = np.empty(0, dtype=np.int64)
+        price = np.empty(0, dtype=np.float64)
+
+    game_index = {game_id: index for index, game_id in enumerate(game_ids)}
+    drm_index = {name: index for index, name in enumerate(drms)}
+    new_game = np.array([game_index.setdefault(row[1], len(game_index)) for row in rows], dtype=np.int64)
+    new_drm = np.array([drm_index.setdefault(row[2], len(drm_index)) for row in rows], dtype=np.int64)
+    game_ids = list(game_index)
+    drms = list(drm_index)
+    if len(drms) > np.iinfo(COLUMNS["drm"]).max + 1:
+        raise ValueError(f"Too many distinct DRMs for the archive: {len(drms)}")
+
+    version = f"v{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
+    os.makedirs(archive_dir, exist_ok=True)
+    _write_version(
+        archive_dir, version, game_ids, drms,
+        np.concatenate((game, new_game)),
+        np.concatenate((drm, new_drm)),
+        np.concatenate((timestamp, _to_epoch([row[4] for row in rows]))),
+        np.concatenate((price, [row[3] for row in rows])),
+        [rows[-1][0], cutoff]
+    )
+
+    # Switch readers to the new version, then drop the archived rows and the old version
+    temp_file = os.path.join(archive_dir, f"{CURRENT_FILE}.tmp")
+    with open(temp_file, "w") as file:
+        file.write(version)
+    os.replace(temp_file, os.path.join(archive_dir, CURRENT_FILE))
+
+    with conn:
+        conn.execute("DELETE FROM listings WHERE id <= ? AND created_at < ?", (rows[-1][0], cutoff))
+    if current is not None:
+        shutil.rmtree(current.path, ignore_errors=True)
+
+    logger.info(f"Archived {len(rows)} listings older than {older_than_days} days into {version}")
+    return len(rows)
+
+
+async def run_archiver():
+    """Compact old listings into the archive now and then once a day."""
+    while True:
+        try:
+            await asyncio.to_thread(compact_listings, ARCHIVE_AFTER_DAYS)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            # Locked or busy database included; the next run picks up where this one stopped
+            logger.info(f"Failed to archive listings: {e}")
+        await asyncio.sleep(ARCHIVE_INTERVAL_SECONDS)
@@ -8,22 +8,66 @@ load_dotenv()
 # Load settings
 config = ConfigParser()
 config.read("./settings.ini")
+if not config.has_section("GENERAL"):
+    # No settings.ini in the working directory (e.g. imported from elsewhere); use the defaults below
+    config.add_section("GENERAL")
 
 # Extract settings
-REFRESH_RATE = int(config["GENERAL"]["refresh_rate"])
-MIN_PROFIT = float(config["GENERAL"]["min_profit"])
-MIN_PRICE = float(config["GENERAL"]["min_price"])
-SOUND_PROFIT = float(config["GENERAL"]["sound_profit"])
+REFRESH_RATE = config["GENERAL"].getint("refresh_rate", fallback=30)
+MIN_REFRESH_RATE = config["GENERAL"].getfloat("min_refresh_rate", fallback=5.0)
+MAX_REFRESH_RATE = config["GENERAL"].getfloat("max_refresh_rate", fallback=120.0)
+ARRIVAL_EWMA_ALPHA = config["GENERAL"].getfloat("arrival_ewma_alpha", fallback=0.2)
+MIN_PROFIT = config["GENERAL"].getfloat("min_profit", fallback=0.0)
+MIN_PRICE = config["GENERAL"].getfloat("min_price", fallback=10.0)
+SOUND_PROFIT = config["GENERAL"].getfloat("sound_profit", fallback=20.0)
+KEYSHOP_CACHE_TTL = config["GENERAL"].getint("keyshop_cache_ttl", fallback=300)
+KEYSHOP_CACHE_SIZE = config["GENERAL"].getint("keyshop_cache_size", fallback=1024)
+KEYSHOP_MAX_IN_FLIGHT = config["GENERAL"].getint("keyshop_max_in_flight", fallback=8)
+KEYSHOP_RATE_LIMIT = config["GENERAL"].getfloat("keyshop_rate_limit", fallback=4.0)
+KEYSHOP_BOUND_MAX_AGE = config["GENERAL"].getint("keyshop_bound_max_age", fallback=3600)
+KEYSHOP_BOUND_MARGIN = config["GENERAL"].getfloat("keyshop_bound_margin", fallback=0.1)
+KEYSHOP_BURST = config["GENERAL"].getint("keyshop_burst", fallback=8)
+RETRY_BACKOFF_BASE = config["GENERAL"].getfloat("retry_backoff_base", fallback=1.0)
+RETRY_BACKOFF_MAX = config["GENERAL"].getfloat("retry_backoff_max", fallback=30.0)
+FEEDS = [feed.strip() for feed in config["GENERAL"].get("feeds", fallback="/deals/new-deals/").split(",") if feed.strip()]
+MAX_PAGES = config["GENERAL"].getint("max_pages", fallback=5)
+PAGE_CONCURRENCY = config["GENERAL"].getint("page_concurrency", fallback=3)
+PARSE_WORKERS = config["GENERAL"].getint("parse_workers", fallback=0)
+PIPELINE_QUEUE_SIZE = config["GENERAL"].getint("pipeline_queue_size", fallback=500)
+PIPELINE_DRAIN_TIMEOUT = config["GENERAL"].getfloat("pipeline_drain_timeout", fallback=30.0)
+KEYSHOP_WORKERS = config["GENERAL"].getint("keyshop_workers", fallback=0)
+KEYSHOP_JOB_TIMEOUT = config["GENERAL"].getfloat("keyshop_job_timeout", fallback=120.0)
+ARCHIVE_AFTER_DAYS = config["GENERAL"].getint("archive_after_days", fallback=0)
+ANOMALY_MIN_SAMPLES = config["GENERAL"].getint("anomaly_min_samples", fallback=5)
+ANOMALY_ZSCORE = config["GENERAL"].getfloat("anomaly_zscore", fallback=2.0)
+ANOMALY_ONLY = config["GENERAL"].getboolean("anomaly_only", fallback=False)
+PRICE_HISTORY_SNAPSHOT_INTERVAL = config["GENERAL"].getint("price_history_snapshot_interval", fallback=300)
+SEEN_LISTINGS_KEPT = config["GENERAL"].getint("seen_listings_kept", fallback=5000)
+HTTP_POOL_SIZE = config["GENERAL"].getint("http_pool_size", fallback=100)
+HTTP_POOL_SIZE_PER_HOST = config["GENERAL"].getint("http_pool_size_per_host", fallback=16)
+HTTP_KEEPALIVE_TIMEOUT = config["GENERAL"].getfloat("http_keepalive_timeout", fallback=60.0)
+HTTP_DNS_CACHE_TTL = config["GENERAL"].getint("http_dns_cache_ttl", fallback=300)
+HTTP_CONNECT_TIMEOUT = config["GENERAL"].getfloat("http_connect_timeout", fallback=10.0)
+HTTP_READ_TIMEOUT = config["GENERAL"].getfloat("http_read_timeout", fallback=30.0)
+HTTP_TOTAL_TIMEOUT = config["GENERAL"].getfloat("http_total_timeout", fallback=60.0)
+HTTP_COMPRESSION = config["GENERAL"].getboolean("http_compression", fallback=True)
+METRICS_PORT = config["GENERAL"].getint("metrics_port", fallback=0)
+METRICS_SUMMARY = config["GENERAL"].getboolean("metrics_summary", fallback=False)
 
 NOTIFICATION_SOUND = os.getenv("NOTIFICATION_SOUND")
 DB_FILE = os.getenv("DB_FILE")
 CHROMEDRIVER_PATH = os.getenv("CHROMEDRIVER_PATH")
 BASE_URL = os.getenv("BASE_URL")
 DISCORD_WEBHOOK_URL = os.getenv("DISCORD_WEBHOOK_URL")
-CACHE_DURATION_HOURS = int(os.getenv("CACHE_DURATION_HOURS"))
+CACHE_DURATION_HOURS = int(os.getenv("CACHE_DURATION_HOURS", "24"))
 CACHE_FILE = os.getenv("CACHE_FILE")
 EUR_TO_USD_URL = os.getenv("EUR_TO_USD_URL")
 USD_TO_PLN_URL = os.getenv("USD_TO_PLN_URL")
+SESSION_FILE = os.getenv("SESSION_FILE", "gg_session.json")
+SESSION_MAX_AGE_HOURS = int(os.getenv("SESSION_MAX_AGE_HOURS", "12"))
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+LOG_FILE = os.getenv("LOG_FILE", "debug/main.log")
+WORKER_PROXIES = [proxy.strip() for proxy in os.getenv("WORKER_PROXIES", "").split(",") if proxy.strip()]
 
 ALLOWED_DRMS = os.getenv("ALLOWED_DRMS", "")
 ALLOWED_DRMS = [drm.strip() for drm in ALLOWED_DRMS.split(",") if drm.strip()]
\ No newline at end of file
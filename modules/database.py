@@ -1,13 +1,214 @@
+import atexit
+import json
+import queue
 import sqlite3
+import threading
+import time
 from datetime import datetime
 from modules.config import DB_FILE
+from modules.logger import get_logger
+from modules.metrics import timed
+
+logger = get_logger('database')
+
+# Maximum number of queued listings written in one transaction
+WRITE_BATCH_SIZE = 500
+
+# Seconds flush_database waits for the writer thread before giving up
+FLUSH_TIMEOUT_SECONDS = 30
+
+# Number of recent prices kept per (game_id, drm) in price_stats
+LAST_PRICES_KEPT = 10
+
+# Bumped whenever a migration is appended to MIGRATIONS
+SCHEMA_VERSION = 3
+
+INSERT_LISTING = """
+    INSERT INTO listings (game_id, name, drm, price, created_at, url)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+# One long-lived connection per thread (the event loop reads, the writer thread writes)
+_local = threading.local()
+
+# Listings waiting to be written by the writer thread; None asks it to stop
+_write_queue = queue.Queue()
+_writer_thread = None
+
+
+# Connection Functions
+def get_connection():
+    """Return this thread's persistent WAL-mode connection, opening it on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_FILE)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # WAL stays consistent; only the last commits can be lost on power failure
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-16000")   # 16 MB page cache
+        conn.execute("PRAGMA busy_timeout=5000")
+        _local.conn = conn
+    return conn
+
+
+def _update_price_stats(conn, rows):
+    """Fold newly inserted listing rows into the per-(game_id, drm) aggregates."""
+    grouped = {}
+    for game_id, _, drm, price, created_at, _ in rows:
+        grouped.setdefault((game_id, drm), []).append((price, created_at))
+
+    for (game_id, drm), observations in grouped.items():
+        stats = conn.execute(
+            "SELECT count, sum, min, max, last_prices FROM price_stats WHERE game_id = ? AND drm = ?",
+            (game_id, drm)
+        ).fetchone()
+        count, total, low, high, last_prices = stats if stats else (0, 0.0, None, None, "[]")
+
+        prices = [price for price, _ in observations]
+        count += len(prices)
+        total += sum(prices)
+        low = min(prices) if low is None else min(low, *prices)
+        high = max(prices) if high is None else max(high, *prices)
+        last_prices = (observations[::-1] + [tuple(p) for p in json.loads(last_prices)])[:LAST_PRICES_KEPT]
+
+        conn.execute("""
+            INSERT OR REPLACE INTO price_stats (game_id, drm, count, sum, min, max, last_prices)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (game_id, drm, count, total, low, high, json.dumps(last_prices)))
+
+
+@timed("database_write")
+def _write_listings(conn, rows):
+    """Insert listing rows and update their aggregates in one transaction."""
+    with conn:
+        conn.executemany(INSERT_LISTING, rows)
+        _update_price_stats(conn, rows)
+
+
+def _writer_loop():
+    """Drain the write queue, committing everything that is waiting as one transaction."""
+    conn = get_connection()
+    running = True
+    while running:
+        rows = [_write_queue.get()]
+        while len(rows) < WRITE_BATCH_SIZE:
+            try:
+                rows.append(_write_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        running = None not in rows
+        batch = [row for row in rows if row is not None]
+        try:
+            if batch:
+                _write_listings(conn, batch)
+        except Exception as e:
+            # Never let one bad batch stop the writer, or every later flush would wait forever
+            logger.info(f"Failed to write {len(batch)} listings: {e}")
+        finally:
+            for _ in rows:
+                _write_queue.task_done()
+
+    conn.close()
+    _local.conn = None
+
+
+# Migrations
+def _migrate_price_stats(conn):
+    """Index the price history and build per-(game_id, drm) aggregates from existing rows."""
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_listings_game_drm_created
+        ON listings (game_id, drm, created_at)
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS price_stats (
+            game_id TEXT NOT NULL,
+            drm TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            sum REAL NOT NULL,
+            min REAL NOT NULL,
+            max REAL NOT NULL,
+            last_prices TEXT NOT NULL,
+            PRIMARY KEY (game_id, drm)
+        ) WITHOUT ROWID
+    """)
+
+    last_prices = {}
+    recent_rows = conn.execute("""
+        SELECT game_id, drm, price, created_at FROM (
+            SELECT game_id, drm, price, created_at, ROW_NUMBER() OVER (
+                PARTITION BY game_id, drm ORDER BY created_at DESC, id DESC
+            ) AS position
+            FROM listings
+        )
+        WHERE position <= ?
+        ORDER BY game_id, drm, position
+    """, (LAST_PRICES_KEPT,))
+    for game_id, drm, price, created_at in recent_rows:
+        last_prices.setdefault((game_id, drm), []).append((price, created_at))
+
+    aggregates = conn.execute("""
+        SELECT game_id, drm, COUNT(*), SUM(price), MIN(price), MAX(price)
+        FROM listings GROUP BY game_id, drm
+    """).fetchall()
+    conn.executemany("""
+        INSERT OR REPLACE INTO price_stats (game_id, drm, count, sum, min, max, last_prices)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [
+        (game_id, drm, count, total, low, high, json.dumps(last_prices.get((game_id, drm), [])))
+        for game_id, drm, count, total, low, high in aggregates
+    ])
+
+
+def _migrate_scanner_state(conn):
+    """Add the tables that let the scanner resume where it stopped."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS feed_watermarks (
+            feed_url TEXT PRIMARY KEY,
+            last_check TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS seen_listings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            game_id TEXT NOT NULL,
+            listing_url TEXT NOT NULL,
+            price REAL NOT NULL,
+            listing_time TEXT NOT NULL,
+            UNIQUE (game_id, listing_url, price)
+        )
+    """)
+
+
+def _migrate_price_history(conn):
+    """Add running mean/variance snapshots per (game_id, drm), seeded from the stored listings."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS price_history (
+            game_id TEXT NOT NULL,
+            drm TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            mean REAL NOT NULL,
+            m2 REAL NOT NULL,
+            PRIMARY KEY (game_id, drm)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        INSERT OR IGNORE INTO price_history (game_id, drm, count, mean, m2)
+        SELECT game_id, drm, COUNT(*), AVG(price), MAX(SUM(price * price) - COUNT(*) * AVG(price) * AVG(price), 0)
+        FROM listings GROUP BY game_id, drm
+    """)
+
+
+# Applied in order; MIGRATIONS[i] upgrades a database from user_version i to i + 1
+MIGRATIONS = [_migrate_price_stats, _migrate_scanner_state, _migrate_price_history]
+
 
 # Database Functions
 def initialize_database():
-    """Create the database and table if they do not exist."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("""
+    """Create and migrate the schema if needed and start the writer thread."""
+    global _writer_thread
+    conn = get_connection()
+    conn.execute("""
         CREATE TABLE IF NOT EXISTS listings (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             game_id TEXT NOT NULL,
@@ -19,17 +220,117 @@ def initialize_database():
         )
     """)
     conn.commit()
-    conn.close()
 
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for migrate in MIGRATIONS[version:SCHEMA_VERSION]:
+        with conn:
+            migrate(conn)
+            version += 1
+            conn.execute(f"PRAGMA user_version = {version}")
+
+    if _writer_thread is None:
+        _writer_thread = threading.Thread(target=_writer_loop, name="db-writer", daemon=True)
+        _writer_thread.start()
+        atexit.register(close_database)
 
+
+@timed("save_to_database")
 def save_to_database(game_id, name, drm, price, url):
-    """Save a new listing to the database."""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    """Queue a new listing for the writer thread; never blocks on disk."""
     created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    cursor.execute("""
-        INSERT INTO listings (game_id, name, drm, price, created_at, url)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (game_id, name, drm, price, created_at, url))
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    row = (game_id, name, drm, price, created_at, url)
+    if _writer_thread is None:
+        # No writer running (e.g. one-off scripts), write directly
+        _write_listings(get_connection(), [row])
+        return
+    _write_queue.put(row)
+
+
+def flush_database(timeout=FLUSH_TIMEOUT_SECONDS):
+    """Block until every queued listing has been committed or `timeout` seconds passed; True when flushed."""
+    deadline = time.monotonic() + timeout
+    with _write_queue.all_tasks_done:
+        while _write_queue.unfinished_tasks:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.info(f"Gave up waiting for {_write_queue.unfinished_tasks} queued listings to be written")
+                return False
+            _write_queue.all_tasks_done.wait(remaining)
+    return True
+
+
+def close_database():
+    """Flush pending writes and stop the writer thread."""
+    global _writer_thread
+    if _writer_thread is not None:
+        _write_queue.put(None)
+        _writer_thread.join()
+        _writer_thread = None
+
+
+def fetch_price_data(game_id, drm):
+    """
+    Fetch average price and last 10 prices for a given game ID and DRM from the price_stats aggregates.
+    """
+    stats = get_connection().execute(
+        "SELECT sum / count, last_prices FROM price_stats WHERE game_id = ? AND drm = ?",
+        (game_id, drm)
+    ).fetchone()
+    if not stats:
+        return None, []
+
+    avg_price, last_prices = stats
+    return avg_price, [tuple(price) for price in json.loads(last_prices)]
+
+
+# Scanner State
+def load_scanner_state(seen_limit):
+    """Return ({feed_url: last_check}, [(game_id, listing_url, price), ...]) saved by the last run.
+
+    The seen keys are the `seen_limit` most recent ones, oldest first.
+    """
+    conn = get_connection()
+    watermarks = {
+        feed_url: datetime.fromisoformat(last_check)
+        for feed_url, last_check in conn.execute("SELECT feed_url, last_check FROM feed_watermarks")
+    }
+    seen_keys = conn.execute("""
+        SELECT game_id, listing_url, price FROM (
+            SELECT id, game_id, listing_url, price FROM seen_listings ORDER BY id DESC LIMIT ?
+        ) ORDER BY id
+    """, (seen_limit,)).fetchall()
+    return watermarks, seen_keys
+
+
+def save_scanner_state(watermarks, seen_listings, seen_limit):
+    """Persist advanced feed watermarks and newly seen listing keys, keeping the newest `seen_limit` keys."""
+    conn = get_connection()
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO feed_watermarks (feed_url, last_check) VALUES (?, ?)",
+            [(feed_url, last_check.isoformat()) for feed_url, last_check in watermarks.items()]
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO seen_listings (game_id, listing_url, price, listing_time) VALUES (?, ?, ?, ?)",
+            [(game_id, listing_url, price, listing_time.isoformat()) for (game_id, listing_url, price), listing_time in seen_listings]
+        )
+        conn.execute(
+            "DELETE FROM seen_listings WHERE id <= (SELECT MAX(id) FROM seen_listings) - ?",
+            (seen_limit,)
+        )
+
+
+# Price History
+def load_price_history():
+    """Return every saved [(game_id, drm, count, mean, m2), ...] snapshot row."""
+    return get_connection().execute("SELECT game_id, drm, count, mean, m2 FROM price_history").fetchall()
+
+
+def save_price_history(rows):
+    """Persist (game_id, drm, count, mean, m2) snapshot rows."""
+    conn = get_connection()
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO price_history (game_id, drm, count, mean, m2) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
@@ -1,8 +1,19 @@
-import requests
-import sqlite3
+import aiohttp
+import asyncio
+import random
 from datetime import datetime
+from modules.database import fetch_price_data
 from modules.tax_calculations import calculate_profit, get_exchange_rates
 from modules.config import ALLOWED_DRMS, DISCORD_WEBHOOK_URL
+from modules.logger import get_logger
+from modules.metrics import timed, increment
+
+logger = get_logger('discord')
+
+# Discord accepts at most 10 embeds and 6000 embed characters per message
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+MAX_DELIVERY_ATTEMPTS = 5
 
 # Platform emojis for Discord notifications
 PLATFORM_EMOJIS = {
@@ -10,30 +21,6 @@ PLATFORM_EMOJIS = {
     "Other DRM": "<:innyklucz:1260269158403145820>"
 }
 
-def fetch_price_data(game_id, drm, db_path="listing_data.db"):
-    """
-    Fetch average price and last 10 prices for a given game ID and DRM from the SQLite database.
-    """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    # Calculate the average price
-    cursor.execute(
-        "SELECT AVG(price) FROM listings WHERE game_id = ? AND drm = ?",
-        (game_id, drm)
-    )
-    avg_price = cursor.fetchone()[0]
-
-    # Fetch the last 10 prices
-    cursor.execute(
-        "SELECT price, created_at FROM listings WHERE game_id = ? AND drm = ? ORDER BY created_at DESC LIMIT 10",
-        (game_id, drm)
-    )
-    last_10_prices = cursor.fetchall()
-
-    conn.close()
-    return avg_price, last_10_prices
-
 def format_last_10_prices(last_10_prices):
     """
     Format the last 10 prices into a readable string for Discord notifications.
@@ -41,9 +28,9 @@ def format_last_10_prices(last_10_prices):
     """
     return "\n".join([f"{price[0]:.2f} zł ({price[1][:10]})" for price in last_10_prices])
 
-def send_discord_notification(listing, db_path="listing_data.db"):
+def build_embed(listing):
     """
-    Send a notification to Discord for a given listing.
+    Build the Discord embed for a given listing.
     """
     # Fetch exchange rates
     exchange_rates = get_exchange_rates()
@@ -66,7 +53,7 @@ def send_discord_notification(listing, db_path="listing_data.db"):
     )
 
     # Fetch average price and last 10 prices from the database
-    avg_price, last_10_prices = fetch_price_data(listing["game_id"], listing["drm"], db_path)
+    avg_price, last_10_prices = fetch_price_data(listing["game_id"], listing["drm"])
 
     # Format the last 10 prices
     last_10_prices_str = format_last_10_prices(last_10_prices)
@@ -91,17 +78,144 @@ def send_discord_notification(listing, db_path="listing_data.db"):
         ]
     }
 
-    data = {
-        "content": None,
-        "embeds": [embed]
-    }
+    return embed
 
-    print(listing["drm"])
 
-    if listing["drm"] in ALLOWED_DRMS:
-        # Send the notification to Discord
-        response = requests.post(DISCORD_WEBHOOK_URL, json=data)
-        if response.status_code != 204:
-            print(f"Failed to send notification: {response.status_code}, {response.text}")
-    else:
-        print(f"{listing["drm"]} is not in allowed list. Skipping!")
+@timed("send_discord_notification")
+def send_discord_notification(listing):
+    """
+    Queue a notification to Discord for a given listing. Delivery happens in the dispatcher.
+    """
+    if listing["drm"] not in ALLOWED_DRMS:
+        logger.info(f"{listing['drm']} is not in allowed list. Skipping!")
+        return
+
+    dispatcher.enqueue(build_embed(listing))
+
+
+def embed_size(embed):
+    """Count the characters Discord counts towards the per-message embed limit."""
+    return len(embed.get("title", "")) + sum(len(field["name"]) + len(field["value"]) for field in embed["fields"])
+
+
+class DiscordDispatcher:
+    """Delivers queued embeds to a webhook in batches, off the scanning critical path.
+
+    Honors Discord's X-RateLimit-* headers and 429 responses.
+    """
+
+    def __init__(self, webhook_url):
+        self.webhook_url = webhook_url
+        self._queue = None
+        self._carry = None  # embed that did not fit into the previous message
+        self._session = None
+        self._worker = None
+        self._blocked_until = 0.0
+        self.stats = {"queued": 0, "sent": 0, "messages": 0, "rate_limited": 0, "failed": 0}
+
+    def start(self, session):
+        """Start delivering on the given aiohttp session."""
+        self._session = session
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Deliver everything still queued and stop the worker."""
+        if self._worker is None:
+            return
+        await self._queue.join()
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        # The queue and rate-limit deadline belong to this event loop; start() makes new ones
+        self._worker = None
+        self._queue = None
+        self._blocked_until = 0.0
+
+    def enqueue(self, embed):
+        self.stats["queued"] += 1
+        self._queue.put_nowait(embed)
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize() if self._queue else 0
+
+    async def _run(self):
+        while True:
+            embeds = [self._carry or await self._queue.get()]
+            self._carry = None
+            size = embed_size(embeds[0])
+            # Pack whatever else is already waiting into the same message
+            while len(embeds) < MAX_EMBEDS_PER_MESSAGE and not self._queue.empty():
+                embed = self._queue.get_nowait()
+                if size + embed_size(embed) > MAX_EMBED_CHARS_PER_MESSAGE:
+                    self._carry = embed
+                    break
+                embeds.append(embed)
+                size += embed_size(embed)
+            try:
+                await self._deliver(embeds)
+            except Exception as e:
+                self.stats["failed"] += len(embeds)
+                increment("notifications_failed", len(embeds))
+                logger.info(f"Unexpected error while sending {len(embeds)} notifications: {e}")
+            finally:
+                for _ in embeds:
+                    self._queue.task_done()
+
+    @timed("discord_deliver")
+    async def _deliver(self, embeds):
+        loop = asyncio.get_running_loop()
+        data = {"content": None, "embeds": embeds}
+
+        for attempt in range(MAX_DELIVERY_ATTEMPTS):
+            # Wait out an exhausted rate-limit bucket before sending
+            delay = self._blocked_until - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            try:
+                async with self._session.post(self.webhook_url, json=data) as response:
+                    self._update_rate_limit(response.headers)
+
+                    if response.status in (200, 204):
+                        self.stats["sent"] += len(embeds)
+                        self.stats["messages"] += 1
+                        increment("notifications_sent", len(embeds))
+                        return
+
+                    if response.status == 429:
+                        self.stats["rate_limited"] += 1
+                        increment("discord_rate_limited")
+                        body = await response.json(content_type=None)
+                        retry_after = float(body.get("retry_after") or response.headers.get("Retry-After") or 1)
+                        self._blocked_until = max(self._blocked_until, loop.time() + retry_after)
+                        logger.info(f"Discord rate limited the webhook, retrying in {retry_after:.2f}s")
+                        continue
+
+                    text = await response.text()
+                    logger.info(f"Failed to send notification: {response.status}, {text}")
+                    if response.status < 500:
+                        break
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                logger.info(f"Attempt {attempt + 1}: Error while sending notification: {e}")
+
+            await asyncio.sleep(random.uniform(0, 2 ** attempt))
+
+        self.stats["failed"] += len(embeds)
+        increment("notifications_failed", len(embeds))
+
+    def _update_rate_limit(self, headers):
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset_after = headers.get("X-RateLimit-Reset-After")
+        if remaining is not None and reset_after is not None and int(remaining) == 0:
+            loop_time = asyncio.get_running_loop().time()
+            self._blocked_until = max(self._blocked_until, loop_time + float(reset_after))
+
+
+# Shared dispatcher for the webhook configured in .env
+dispatcher = DiscordDispatcher(DISCORD_WEBHOOK_URL)
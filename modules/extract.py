@@ -1,11 +1,26 @@
-from bs4 import BeautifulSoup
+import re
+import asyncio
+import hashlib
+import multiprocessing
+from datetime import datetime, timezone
+from bs4 import BeautifulSoup, SoupStrainer
 from modules.config import BASE_URL
+from modules.metrics import timed
 
-# Helper Functions
-def extract_drm_from_listing(listing_html):
-    """Extract DRM from the listing HTML."""
-    soup = BeautifulSoup(listing_html, 'html.parser')
-    drm_tag = soup.find("div", class_="tag-drm")
+# Only build the parts of the page we actually read
+LISTING_STRAINER = SoupStrainer("div", class_=re.compile(r"(^|\s)hoverable-box(\s|$)"))
+KEYSHOP_STRAINER = SoupStrainer("div", attrs={"data-shops-names": True})
+
+# Attributes that identify what the listing region currently shows
+LISTING_FINGERPRINT = re.compile(rb'(?:data-container-game-id|da-value|datetime)="[^"]*"')
+
+# Process pool that parses pages off the event loop; None parses inline
+_parse_executor = None
+
+# Tag Helpers (work on already parsed nodes)
+def extract_drm(tag):
+    """Extract DRM from a parsed listing or keyshop tag."""
+    drm_tag = tag.find("div", class_="tag-drm")
     if drm_tag:
         svg_tag = drm_tag.find("svg")
         if svg_tag and "title" in svg_tag.attrs:
@@ -13,12 +28,9 @@ def extract_drm_from_listing(listing_html):
     return None
 
 
-def extract_listing_details(listing_html):
-    """Extract additional details (game name, URL, price) from a listing."""
-    soup = BeautifulSoup(listing_html, 'html.parser')
-
-    # Full game name and URL
-    link_tag = soup.find("a", class_="full-link")
+def extract_details(listing_tag):
+    """Extract game name, URL and price from a parsed hoverable-box tag."""
+    link_tag = listing_tag.find("a", class_="full-link")
     if link_tag:
         game_name = link_tag.get("aria-label", "").replace("Go to: ", "").strip()
         listing_url = BASE_URL + link_tag.get("href", "")
@@ -26,7 +38,110 @@ def extract_listing_details(listing_html):
         game_name = "Unknown Game"
         listing_url = None
 
-    # Current price
-    price = soup.find("div", class_="hoverable-box").get("da-value", None)
+    price = listing_tag.get("da-value", None)
+
+    return game_name, listing_url, float(price) if price else None
+
+
+def listing_region_digest(html_content):
+    """Hash the listing ids, prices and times on a page (raw bytes) without parsing it."""
+    fingerprint = b"\n".join(LISTING_FINGERPRINT.findall(html_content))
+    return hashlib.sha1(fingerprint).hexdigest()
+
+
+# Page Extractors (one parse per page)
+def extract_listings(html_content, usd_to_pln):
+    """Parse the new-deals page once and return listing dicts with prices in PLN."""
+    soup = BeautifulSoup(html_content, 'html.parser', parse_only=LISTING_STRAINER)
+
+    extracted_listings = []
+    for listing in soup.find_all('div', class_='hoverable-box'):
+        drm = extract_drm(listing)
+        if not drm:
+            continue
+
+        time_tag = listing.find('time')
+        if not time_tag:
+            continue
+
+        game_name, listing_url, price = extract_details(listing)
+        if price is None:
+            continue
+
+        listing_time = datetime.fromisoformat(time_tag['datetime']).astimezone(timezone.utc)
+
+        extracted_listings.append({
+            "game_id": listing.get('data-container-game-id'),
+            "game_name": game_name,
+            "listing_url": listing_url,
+            "current_price": price * usd_to_pln,  # Store price in PLN
+            "listed_price": price,  # As shown on the page, stable across exchange rate refreshes
+            "listing_time": listing_time,
+            "drm": drm
+        })
+
+    return extracted_listings
 
-    return game_name, listing_url, float(price) if price else None
\ No newline at end of file
+
+def extract_keyshops(html_content, listing_drm):
+    """Parse a keyshopsDeals response once and return the offers matching the DRM."""
+    soup = BeautifulSoup(html_content, 'html.parser', parse_only=KEYSHOP_STRAINER)
+
+    keyshops = []
+    for shop in soup.find_all('div', attrs={'data-shops-names': True}):
+        drm = extract_drm(shop)
+        if not drm or drm != listing_drm:
+            continue
+
+        shop_name = shop.get('data-shops-names', '').lower()
+        keyshops.append({"name": shop_name, "price": float(shop.get('data-deals-value')), "drm": drm})
+
+    return keyshops
+
+
+# Parsing Executor
+def start_parse_executor(workers):
+    """Start a pool of `workers` parsing processes; with 0 workers pages are parsed inline."""
+    global _parse_executor
+    if workers > 0 and _parse_executor is None:
+        from concurrent.futures import ProcessPoolExecutor
+        # Spawned rather than forked: the database writer and keyshop reader threads are already running
+        _parse_executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def shutdown_parse_executor():
+    global _parse_executor
+    if _parse_executor is not None:
+        _parse_executor.shutdown(cancel_futures=True)
+        _parse_executor = None
+
+
+# Timed here rather than on extract_* since those run in the pool workers
+@timed("extract_listings")
+async def parse_listings(html_content, usd_to_pln):
+    """Run extract_listings on raw page bytes in the parsing pool."""
+    if _parse_executor is None:
+        return extract_listings(html_content, usd_to_pln)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_parse_executor, extract_listings, html_content, usd_to_pln)
+
+
+@timed("extract_keyshops")
+async def parse_keyshops(html_content, listing_drm):
+    """Run extract_keyshops on raw response bytes in the parsing pool."""
+    if _parse_executor is None:
+        return extract_keyshops(html_content, listing_drm)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_parse_executor, extract_keyshops, html_content, listing_drm)
+
+
+# HTML String Wrappers
+def extract_drm_from_listing(listing_html):
+    """Extract DRM from the listing HTML."""
+    return extract_drm(BeautifulSoup(listing_html, 'html.parser'))
+
+
+def extract_listing_details(listing_html):
+    """Extract additional details (game name, URL, price) from a listing."""
+    soup = BeautifulSoup(listing_html, 'html.parser')
+    return extract_details(soup.find("div", class_="hoverable-box"))
@@ -1,10 +1,35 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
-from modules.config import CHROMEDRIVER_PATH
+import os
+import json
+import asyncio
+import aiohttp
+import time
+from email.utils import parsedate_to_datetime
+from bs4 import BeautifulSoup, SoupStrainer
+from modules.config import CHROMEDRIVER_PATH, BASE_URL, SESSION_FILE, SESSION_MAX_AGE_HOURS
+from modules.http_client import BROWSER_HEADERS
+from modules.logger import get_logger
+
+logger = get_logger('session')
+
+# Stop reusing saved credentials this long before they expire
+EXPIRY_MARGIN_SECONDS = 300
+
+# The credential refresh currently in flight, shared by every caller
+_refresh_task = None
+
+
+def extract_csrf_token(page_source):
+    """Read the CSRF token from the page's meta tag."""
+    soup = BeautifulSoup(page_source, 'html.parser', parse_only=SoupStrainer('meta'))
+    meta_tag = soup.find('meta', {'name': 'csrf-token'})
+    return meta_tag['content'] if meta_tag else None
+
 
 def get_gg_deals_session():
+    # Selenium is only needed when the plain HTTP handshake fails, so import it here
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+
     # Set up Selenium WebDriver
     print(f"Using ChromeDriver Path: {CHROMEDRIVER_PATH}")
     service = Service(CHROMEDRIVER_PATH)
@@ -15,7 +40,7 @@ def get_gg_deals_session():
 
     try:
         # Open GGDeals page
-        driver.get("https://gg.deals/")
+        driver.get(f"{BASE_URL}/")
         print("Browser launched successfully!")
 
         # Retrieve cookies
@@ -25,17 +50,117 @@ def get_gg_deals_session():
         gg_csrf = cookie_dict.get('gg_csrf')
 
         # Extract CSRF token from HTML
-        page_source = driver.page_source
-        soup = BeautifulSoup(page_source, 'html.parser')
-        csrf_token = soup.find('meta', {'name': 'csrf-token'})['content']
+        csrf_token = extract_csrf_token(driver.page_source)
+
+        # Earliest expiry of the cookies we use, if the browser reported one
+        expiries = [cookie['expiry'] for cookie in cookies if cookie['name'] in ('gg-session', 'gg_csrf') and 'expiry' in cookie]
+        expires_at = min(expiries) if expiries else None
 
-        return gg_session, gg_csrf, csrf_token
+        return gg_session, gg_csrf, csrf_token, expires_at
     except Exception as e:
         print(f"Error: {e}")
     finally:
         print("Quitting driver")
         driver.quit()
 
+
+# Saved Credentials
+def load_saved_session():
+    """Return credentials saved by a previous run, or None if missing or about to expire."""
+    if not os.path.exists(SESSION_FILE):
+        return None
+    try:
+        with open(SESSION_FILE, "r") as file:
+            credentials = json.load(file)
+    except (OSError, ValueError) as e:
+        logger.info(f"Ignoring unreadable session file {SESSION_FILE}: {e}")
+        return None
+
+    if credentials.get("expires_at", 0) - EXPIRY_MARGIN_SECONDS < time.time():
+        return None
+    return credentials
+
+
+def save_session(credentials):
+    """Persist credentials atomically for the next run."""
+    temp_file = f"{SESSION_FILE}.tmp"
+    with open(temp_file, "w") as file:
+        json.dump(credentials, file)
+    os.replace(temp_file, SESSION_FILE)
+
+
+def _make_credentials(gg_session, gg_csrf, csrf_token, expires_at=None):
+    return {
+        "gg_session": gg_session,
+        "gg_csrf": gg_csrf,
+        "csrf_token": csrf_token,
+        "expires_at": expires_at or time.time() + SESSION_MAX_AGE_HOURS * 3600
+    }
+
+
+def _cookie_expiry(morsel):
+    """Return the absolute expiry of a cookie as a UNIX timestamp, or None for session cookies."""
+    if morsel["max-age"]:
+        return time.time() + int(morsel["max-age"])
+    if morsel["expires"]:
+        return parsedate_to_datetime(morsel["expires"]).timestamp()
+    return None
+
+
+# Credential Handshakes
+async def fetch_session_http(session):
+    """Get the session cookies and CSRF token with a plain GET of the home page."""
+    try:
+        async with session.get(f"{BASE_URL}/", headers=BROWSER_HEADERS) as response:
+            if response.status != 200:
+                logger.info(f"Home page returned {response.status}, cannot read session over HTTP")
+                return None
+            page_source = await response.text()
+            cookies = response.cookies
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.info(f"Failed to fetch home page for session: {e}")
+        return None
+
+    gg_session = cookies["gg-session"].value if "gg-session" in cookies else None
+    gg_csrf = cookies["gg_csrf"].value if "gg_csrf" in cookies else None
+    csrf_token = extract_csrf_token(page_source)
+    if not gg_session or not csrf_token:
+        return None
+
+    expiries = [expiry for expiry in (_cookie_expiry(cookies[name]) for name in ("gg-session", "gg_csrf") if name in cookies) if expiry]
+    return _make_credentials(gg_session, gg_csrf, csrf_token, min(expiries) if expiries else None)
+
+
+async def _refresh_session_credentials(session):
+    credentials = await fetch_session_http(session)
+    if credentials is None:
+        logger.info("Falling back to Selenium for session credentials")
+        result = await asyncio.to_thread(get_gg_deals_session)
+        if not result or not result[2]:
+            raise RuntimeError("Could not obtain gg.deals session credentials")
+        credentials = _make_credentials(*result)
+
+    await asyncio.to_thread(save_session, credentials)
+    logger.info("Session credentials refreshed")
+    return credentials
+
+
+async def refresh_session_credentials(session):
+    """Fetch new credentials, sharing one handshake between concurrent callers."""
+    global _refresh_task
+    if _refresh_task is None or _refresh_task.done():
+        _refresh_task = asyncio.ensure_future(_refresh_session_credentials(session))
+    return await asyncio.shield(_refresh_task)
+
+
+async def get_session_credentials(session):
+    """Return saved credentials if still valid, otherwise run a fresh handshake."""
+    credentials = await asyncio.to_thread(load_saved_session)
+    if credentials is not None:
+        return credentials
+    return await refresh_session_credentials(session)
+
+
 # Test the function
 if __name__ == "__main__":
     cookies = get_gg_deals_session()
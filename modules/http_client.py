@@ -0,0 +1,99 @@
+import aiohttp
+import functools
+from modules.config import (
+    BASE_URL,
+    HTTP_POOL_SIZE,
+    HTTP_POOL_SIZE_PER_HOST,
+    HTTP_KEEPALIVE_TIMEOUT,
+    HTTP_DNS_CACHE_TTL,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_TOTAL_TIMEOUT,
+    HTTP_COMPRESSION
+)
+from modules.metrics import increment
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36'
+
+# Prebuilt header sets; treat them as read-only
+BROWSER_HEADERS = {
+    'User-Agent': USER_AGENT,
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9'
+}
+KEYSHOP_HEADERS = {
+    'User-Agent': USER_AGENT,
+    'Referer': f"{BASE_URL}/deals/new-deals/",
+    'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8',
+    'Origin': BASE_URL,
+    'x-requested-with': 'XMLHttpRequest'
+}
+
+# Requests and connections since start; `collect_stats` reports them per window
+stats = {"requests": 0, "connections_created": 0, "connections_reused": 0, "tls_handshakes": 0}
+_last_stats = dict(stats)
+
+
+@functools.lru_cache(maxsize=4)
+def keyshop_headers(csrf_token):
+    """Keyshop request headers for a CSRF token, built once per token."""
+    return {**KEYSHOP_HEADERS, 'X-CSRF-Token': csrf_token}
+
+
+# Connection Tracing
+async def _on_request_start(session, context, params):
+    context.scheme = params.url.scheme
+    stats["requests"] += 1
+
+
+async def _on_connection_create_end(session, context, params):
+    stats["connections_created"] += 1
+    increment("http_connections_created")
+    if getattr(context, "scheme", None) == "https":
+        stats["tls_handshakes"] += 1
+        increment("tls_handshakes")
+
+
+async def _on_connection_reuseconn(session, context, params):
+    stats["connections_reused"] += 1
+    increment("http_connections_reused")
+
+
+def collect_stats():
+    """Requests, new and reused connections and TLS handshakes since the previous call."""
+    window = {name: value - _last_stats[name] for name, value in stats.items()}
+    _last_stats.update(stats)
+    connections = window["connections_created"] + window["connections_reused"]
+    window["reuse_ratio"] = window["connections_reused"] / connections if connections else None
+    return window
+
+
+# Session
+def create_session(**kwargs):
+    """Return a ClientSession with the pooled connector, timeouts and tracing every module shares.
+
+    One session serves gg.deals, the exchange rate API and the Discord webhook, so their
+    connections stay alive between requests.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_POOL_SIZE,
+        limit_per_host=HTTP_POOL_SIZE_PER_HOST,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=HTTP_DNS_CACHE_TTL
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=HTTP_TOTAL_TIMEOUT, sock_connect=HTTP_CONNECT_TIMEOUT, sock_read=HTTP_READ_TIMEOUT
+    )
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(_on_request_start)
+    trace_config.on_connection_create_end.append(_on_connection_create_end)
+    trace_config.on_connection_reuseconn.append(_on_connection_reuseconn)
+
+    # aiohttp asks for gzip/deflate (and br with brotli installed) and decompresses by default
+    headers = {'User-Agent': USER_AGENT}
+    if not HTTP_COMPRESSION:
+        headers['Accept-Encoding'] = 'identity'
+
+    return aiohttp.ClientSession(
+        connector=connector, timeout=timeout, headers=headers, trace_configs=[trace_config], **kwargs
+    )
@@ -0,0 +1,101 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+
+class KeyshopCache:
+    """LRU cache of keyshop results with a TTL and single-flight fetching."""
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._in_flight = {}           # key -> asyncio.Task
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0}
+
+    def get(self, key):
+        """Return a fresh cached value for the key, or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """Store a value and evict the least recently used entries over max_size."""
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def get_or_fetch(self, key, fetch):
+        """Return the cached value or await fetch(), sharing one call between concurrent callers."""
+        value = self.get(key)
+        if value is not None:
+            self.stats["hits"] += 1
+            return value
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(task)
+
+        self.stats["misses"] += 1
+        task = asyncio.ensure_future(fetch())
+        self._in_flight[key] = task
+        try:
+            value = await asyncio.shield(task)
+        finally:
+            if task.done():
+                self._in_flight.pop(key, None)
+            else:
+                # Keep it registered for the other waiters and clean up once it settles
+                task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+        # Failed fetches are not cached so the next listing retries
+        if value is not None:
+            self.put(key, value)
+        return value
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class KeyshopBounds:
+    """Last known marketplace prices per key, kept after the cache entry expires.
+
+    They bound what a new listing of the same game could earn, so lookups that cannot beat the
+    profit threshold are skipped. Prices older than max_age are not trusted and force a lookup.
+    """
+
+    def __init__(self, max_age, max_size):
+        self.max_age = max_age
+        self.max_size = max_size
+        self._entries = OrderedDict()  # key -> (recorded_at, prices)
+        self.stats = {"bounded": 0, "skipped": 0, "stale": 0, "unknown": 0}
+
+    def record(self, key, prices):
+        self._entries[key] = (time.monotonic(), prices)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        """Return the last known prices for the key, or None when there are none or they are too old."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats["unknown"] += 1
+            return None
+        recorded_at, prices = entry
+        if time.monotonic() - recorded_at > self.max_age:
+            self.stats["stale"] += 1
+            return None
+        self.stats["bounded"] += 1
+        return prices
+
+    def __len__(self):
+        return len(self._entries)
@@ -1,10 +1,20 @@
 import logging
 import os
+from modules.config import LOG_FILE
 
-def get_logger(name: str = 'app', log_file: str = 'debug/main.log'):
-    # Ensure the log directory exists
-    os.makedirs(os.path.dirname(log_file), exist_ok=True)
 
+class LazyFileHandler(logging.FileHandler):
+    """File handler that creates its directory and file on the first record instead of at import."""
+
+    def __init__(self, filename, mode='a'):
+        super().__init__(filename, mode, delay=True)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
+def get_logger(name: str = 'app', log_file: str = LOG_FILE):
     # Create or retrieve the logger
     logger = logging.getLogger(name)
     logger.setLevel(logging.DEBUG)
@@ -12,7 +22,7 @@ def get_logger(name: str = 'app', log_file: str = 'debug/main.log'):
     # Avoid adding handlers multiple times if reused
     if not logger.handlers:
         # File handler
-        file_handler = logging.FileHandler(log_file, mode='a')
+        file_handler = LazyFileHandler(log_file, mode='a')
         file_handler.setLevel(logging.DEBUG)
         file_format = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
         file_handler.setFormatter(file_format)
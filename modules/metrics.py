@@ -0,0 +1,108 @@
+import asyncio
+import functools
+import time
+from modules.logger import get_logger
+from modules.pipeline import LatencyHistogram
+
+logger = get_logger('metrics')
+
+# Process-wide registries: metric name -> LatencyHistogram / counter value
+HISTOGRAMS = {}
+COUNTERS = {}
+
+# Counter values at the last iteration summary, to report per-iteration deltas
+_last_counters = {}
+
+
+# Recording
+def observe(name, seconds):
+    """Record one duration in the `name` histogram."""
+    histogram = HISTOGRAMS.get(name)
+    if histogram is None:
+        histogram = HISTOGRAMS[name] = LatencyHistogram()
+    histogram.observe(seconds)
+
+
+def increment(name, amount=1):
+    COUNTERS[name] = COUNTERS.get(name, 0) + amount
+
+
+def timed(name):
+    """Decorator recording the wall time of every call (sync or async) in the `name` histogram."""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    observe(name, time.perf_counter() - started)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+# Reporting
+def render_prometheus():
+    """Render every metric in the Prometheus text exposition format."""
+    lines = []
+    for name, value in sorted(COUNTERS.items()):
+        lines.append(f"# TYPE {name}_total counter")
+        lines.append(f"{name}_total {value}")
+
+    for name, histogram in sorted(HISTOGRAMS.items()):
+        metric = f"{name}_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram.count}')
+        lines.append(f"{metric}_sum {histogram.total:.6f}")
+        lines.append(f"{metric}_count {histogram.count}")
+
+    return "\n".join(lines) + "\n"
+
+
+def iteration_summary():
+    """One-line summary of the latency histograms and of the counters since the previous call."""
+    parts = []
+    for name, histogram in sorted(HISTOGRAMS.items()):
+        if histogram.count:
+            parts.append(f"{name} n={histogram.count} p50<={histogram.quantile(0.5)}s p99<={histogram.quantile(0.99)}s")
+
+    for name, value in sorted(COUNTERS.items()):
+        delta = value - _last_counters.get(name, 0)
+        if delta:
+            parts.append(f"{name} +{delta}")
+    _last_counters.update(COUNTERS)
+
+    return ", ".join(parts) or "no activity"
+
+
+# Metrics Endpoint
+async def _handle_metrics(request):
+    from aiohttp import web
+    return web.Response(text=render_prometheus(), content_type="text/plain", charset="utf-8")
+
+
+async def start_metrics_server(port, host="127.0.0.1"):
+    """Serve /metrics on a local port; returns the runner to clean up on shutdown."""
+    from aiohttp import web  # The server side of aiohttp is only needed when metrics are served
+
+    app = web.Application()
+    app.router.add_get("/metrics", _handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return runner
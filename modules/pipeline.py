@@ -0,0 +1,153 @@
+import asyncio
+import bisect
+import itertools
+import time
+from modules.logger import get_logger
+
+logger = get_logger('pipeline')
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is unbounded
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram; cheap enough to update on every item."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile, or None when empty."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Stage:
+    """One pipeline stage: workers take batches from a bounded inbound queue and pass results on.
+
+    `handler` is an async function receiving a list of items and returning the items for the
+    next stage. A full queue blocks the producer, so backpressure shows up as queue depth.
+    With `priority`, items are taken lowest priority(item) first.
+    """
+
+    def __init__(self, name, handler, workers=1, queue_size=100, batch_size=1, priority=None):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.batch_size = batch_size
+        self.priority = priority
+        self.queue = asyncio.PriorityQueue(queue_size) if priority else asyncio.Queue(queue_size)
+        self.next_stage = None
+        self.latency = LatencyHistogram()
+        self.processed = 0
+        self.failed = 0
+        self._sequence = itertools.count()
+        self._tasks = []
+
+    async def put(self, item):
+        if self.priority:
+            item = (self.priority(item), next(self._sequence), item)
+        await self.queue.put(item)
+
+    def _get_nowait(self):
+        item = self.queue.get_nowait()
+        return item[2] if self.priority else item
+
+    async def _get(self):
+        item = await self.queue.get()
+        return item[2] if self.priority else item
+
+    async def _work(self):
+        while True:
+            batch = [await self._get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self._get_nowait())
+
+            started = time.monotonic()
+            try:
+                results = await self.handler(batch)
+                self.processed += len(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                results = None
+                logger.exception(f"Stage {self.name} failed on {len(batch)} items: {e}")
+            self.latency.observe(time.monotonic() - started)
+
+            try:
+                if self.next_stage is not None:
+                    for result in results or ():
+                        await self.next_stage.put(result)
+            finally:
+                # Only done once the results are queued downstream, so drain() sees them
+                for _ in batch:
+                    self.queue.task_done()
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._work(), name=f"{self.name}-{i}") for i in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self):
+        return {
+            "depth": self.queue.qsize(),
+            "capacity": self.queue.maxsize,
+            "processed": self.processed,
+            "failed": self.failed,
+            "p50": self.latency.quantile(0.5),
+            "p99": self.latency.quantile(0.99),
+        }
+
+
+class Pipeline:
+    """Stages connected in order, each feeding the next one's queue."""
+
+    def __init__(self, *stages):
+        self.stages = stages
+        for stage, next_stage in zip(stages, stages[1:]):
+            stage.next_stage = next_stage
+
+    async def put(self, item):
+        await self.stages[0].put(item)
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+
+    async def drain(self):
+        """Wait until every item already queued has passed through all stages."""
+        for stage in self.stages:
+            await stage.queue.join()
+
+    async def stop(self):
+        for stage in self.stages:
+            await stage.stop()
+
+    def stats(self):
+        return {stage.name: stage.stats() for stage in self.stages}
+
+    def summary(self):
+        """One-line per-stage queue depth and latency summary for the iteration log."""
+        parts = []
+        for name, stats in self.stats().items():
+            latency = f"p50<={stats['p50']}s p99<={stats['p99']}s" if stats["p50"] is not None else "idle"
+            parts.append(f"{name} {stats['depth']}/{stats['capacity']} ({latency})")
+        return ", ".join(parts)
@@ -0,0 +1,138 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+
+class TokenBucket:
+    """Token bucket allowing `rate` requests per second with bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def take(self):
+        """Wait until a token is available and consume it."""
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class RequestScheduler:
+    """Limits in-flight requests, rate limits each host and admits waiters by priority.
+
+    Lower priority values are admitted first.
+    """
+
+    def __init__(self, max_in_flight, rate, burst):
+        self.max_in_flight = max_in_flight
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._in_flight = 0
+        self._waiters = []  # heap of (priority, seq, future)
+        self._sequence = itertools.count()
+        self._reset_window()
+
+    def _reset_window(self):
+        self._window_started = time.monotonic()
+        self._completed = 0
+        self._peak_queue_depth = len(self._waiters)
+
+    def _bucket(self, host):
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.rate, self.burst)
+        return self._buckets[host]
+
+    async def _acquire(self, priority):
+        if self._in_flight < self.max_in_flight and not self._waiters:
+            self._in_flight += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self._peak_queue_depth = max(self._peak_queue_depth, len(self._waiters))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # The slot may already have been handed to us; pass it on
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+
+    def _release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # Hand the slot straight to the next waiter
+                future.set_result(None)
+                return
+        self._in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self, host, priority=0.0):
+        """Hold one in-flight slot and one rate-limit token for `host`."""
+        await self._acquire(priority)
+        try:
+            await self._bucket(host).take()
+            yield
+        finally:
+            self._completed += 1
+            self._release()
+
+    @property
+    def queue_depth(self):
+        return len(self._waiters)
+
+    def collect_stats(self):
+        """Return throughput and queue depth since the last call and start a new window."""
+        elapsed = max(time.monotonic() - self._window_started, 1e-9)
+        stats = {
+            "completed": self._completed,
+            "throughput": self._completed / elapsed,
+            "in_flight": self._in_flight,
+            "queue_depth": len(self._waiters),
+            "peak_queue_depth": self._peak_queue_depth,
+        }
+        self._reset_window()
+        return stats
+
+
+def parse_retry_after(value):
+    """Parse a Retry-After header (seconds or HTTP date) into seconds, or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_delay(attempt, base, cap, retry_after=None):
+    """Exponential backoff with full jitter, never shorter than the server's Retry-After."""
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    retry_after = parse_retry_after(retry_after)
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
@@ -0,0 +1,256 @@
+import asyncio
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import zlib
+from modules.config import KEYSHOP_JOB_TIMEOUT, SESSION_FILE, WORKER_PROXIES
+from modules.logger import get_logger
+from modules.scheduler import backoff_delay
+
+logger = get_logger('shards')
+
+# Seconds to wait for a worker to finish its jobs on shutdown before terminating it
+WORKER_STOP_TIMEOUT = 10
+
+# Restarts of a worker without a successful lookup in between before it is given up, and the delay between them
+WORKER_MAX_RESTARTS = 5
+WORKER_RESTART_BACKOFF_BASE = 5.0
+WORKER_RESTART_BACKOFF_MAX = 300.0
+
+# How often result readers check whether their worker was replaced or the shards stopped
+RESULT_POLL_SECONDS = 1.0
+
+
+def shard_for(game_id, drm, shards):
+    """Stable shard of a (game_id, drm) job, so one game is always looked up by the same worker."""
+    return zlib.crc32(f"{game_id}:{drm}".encode()) % shards
+
+
+def worker_session_file(worker_id):
+    """Each worker keeps its own gg.deals session next to the main one."""
+    root, ext = os.path.splitext(SESSION_FILE)
+    return f"{root}.worker{worker_id}{ext}"
+
+
+# Worker Process
+def _worker_main(worker_id, jobs, results):
+    asyncio.run(_serve_jobs(worker_id, jobs, results))
+
+
+async def _serve_jobs(worker_id, jobs, results):
+    """Fetch keyshops for every (job_id, game_id, drm, priority) job until a None job arrives."""
+    from modules import get_cookies
+    from modules.http_client import create_session
+    from scanner import Scanner
+
+    # Own egress IP (when proxies are configured) and own session credentials per worker
+    if WORKER_PROXIES:
+        proxy = WORKER_PROXIES[worker_id % len(WORKER_PROXIES)]
+        os.environ["HTTP_PROXY"] = os.environ["HTTPS_PROXY"] = proxy
+    get_cookies.SESSION_FILE = worker_session_file(worker_id)
+
+    scanner = Scanner()
+    async with create_session(trust_env=True) as session:
+        scanner.session = session
+        scanner.session_credentials.update(await get_cookies.get_session_credentials(session))
+        logger.info(f"Keyshop worker {worker_id} ready")
+
+        async def run_job(job_id, game_id, drm, priority):
+            started = time.monotonic()
+            try:
+                keyshop_data = await scanner.fetch_keyshops(game_id, drm, priority=priority)
+            except Exception as e:
+                logger.info(f"Worker {worker_id} failed to fetch keyshops for game ID {game_id}: {e}")
+                keyshop_data = None
+            results.put((job_id, worker_id, keyshop_data, time.monotonic() - started))
+
+        tasks = set()
+        while True:
+            job = await asyncio.to_thread(jobs.get)
+            if job is None:
+                break
+            task = asyncio.create_task(run_job(*job))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+
+
+# Coordinator
+class KeyshopShards:
+    """Shards keyshop lookups over worker processes and merges the results back.
+
+    Every job gets an id and exactly one awaiting future; a result for a job that was already
+    resolved (e.g. re-sent after a worker died) is dropped, so each lookup completes once.
+    A job not answered within `job_timeout` seconds, or owned by a worker that was given up
+    after too many restarts, resolves to None like a lookup without keyshop data.
+    """
+
+    # Entry point of the worker processes: worker_main(worker_id, jobs, results)
+    worker_main = staticmethod(_worker_main)
+
+    def __init__(self, workers, job_timeout=KEYSHOP_JOB_TIMEOUT):
+        self.workers = workers
+        self.job_timeout = job_timeout
+        self._context = multiprocessing.get_context("spawn")
+        # Per-worker queues, replaced on restart: a killed worker can only leave its own result queue broken
+        self._jobs = [None] * workers
+        self._results = [None] * workers
+        self._processes = [None] * workers
+        self._pending = {}  # job_id -> (worker_id, job, future)
+        self._job_ids = itertools.count()
+        self._loop = None
+        self._stopped = False
+        # Restarts since the worker's last successful lookup, when it may be restarted next, and whether it was given up
+        self._crashes = [0] * workers
+        self._next_restart = [0.0] * workers
+        self._given_up = [False] * workers
+        self.stats = [{"completed": 0, "failed": 0, "timeouts": 0, "restarts": 0, "busy_seconds": 0.0} for _ in range(workers)]
+        self._window = [0] * workers
+        self._window_started = time.monotonic()
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        for worker_id in range(self.workers):
+            self._spawn(worker_id)
+
+    def _spawn(self, worker_id):
+        self._jobs[worker_id] = self._context.Queue()
+        self._results[worker_id] = results = self._context.Queue()
+        process = self._context.Process(
+            target=self.worker_main, args=(worker_id, self._jobs[worker_id], results),
+            name=f"keyshop-worker-{worker_id}", daemon=True
+        )
+        process.start()
+        self._processes[worker_id] = process
+        threading.Thread(
+            target=self._read_results, args=(worker_id, results), name=f"shard-results-{worker_id}", daemon=True
+        ).start()
+
+    def _read_results(self, worker_id, results):
+        """Hand one worker's results to the event loop until the worker is replaced or the shards stop."""
+        while True:
+            try:
+                result = results.get(timeout=RESULT_POLL_SECONDS)
+            except queue.Empty:
+                if self._stopped or self._results[worker_id] is not results:
+                    return
+                continue
+            except (EOFError, OSError):
+                return
+            try:
+                self._loop.call_soon_threadsafe(self._resolve, *result)
+            except RuntimeError:
+                return  # Event loop closed
+
+    def _resolve(self, job_id, worker_id, keyshop_data, elapsed):
+        pending = self._pending.pop(job_id, None)
+        if pending is None:
+            return  # Already resolved or abandoned
+
+        stats = self.stats[worker_id]
+        stats["completed" if keyshop_data else "failed"] += 1
+        stats["busy_seconds"] += elapsed
+        self._window[worker_id] += 1
+        if keyshop_data:
+            self._crashes[worker_id] = 0
+
+        future = pending[2]
+        if not future.done():
+            future.set_result(keyshop_data)
+
+    async def fetch(self, game_id, drm, priority=1.0):
+        """Look up keyshops on the worker owning this game; same result shape as Scanner.fetch_keyshops."""
+        worker_id = shard_for(game_id, drm, self.workers)
+        if self._given_up[worker_id]:
+            self.stats[worker_id]["failed"] += 1
+            return None
+
+        job_id = next(self._job_ids)
+        job = (job_id, game_id, drm, priority)
+        future = self._loop.create_future()
+        self._pending[job_id] = (worker_id, job, future)
+        self._jobs[worker_id].put(job)
+        try:
+            return await asyncio.wait_for(future, self.job_timeout)
+        except asyncio.TimeoutError:
+            logger.info(f"Keyshop worker {worker_id} did not answer for game ID {game_id} within {self.job_timeout}s")
+            self.stats[worker_id]["timeouts"] += 1
+            return None
+        finally:
+            self._pending.pop(job_id, None)
+
+    def _abandon(self, worker_id):
+        """Resolve the unanswered jobs of a worker with no keyshop data."""
+        for job_id, (owner, _, future) in list(self._pending.items()):
+            if owner == worker_id:
+                del self._pending[job_id]
+                self.stats[worker_id]["failed"] += 1
+                if not future.done():
+                    future.set_result(None)
+
+    def check_workers(self):
+        """Restart dead workers, with backoff, and hand them the jobs their predecessor had not answered.
+
+        A worker that keeps dying without a successful lookup (e.g. it cannot get session
+        credentials) is given up after WORKER_MAX_RESTARTS restarts.
+        """
+        now = time.monotonic()
+        for worker_id, process in enumerate(self._processes):
+            if self._given_up[worker_id] or process.is_alive():
+                continue
+            if self._crashes[worker_id] >= WORKER_MAX_RESTARTS:
+                logger.info(f"Keyshop worker {worker_id} exited with {process.exitcode} after {self._crashes[worker_id]} "
+                            f"restarts, giving up; its lookups return no keyshop data")
+                self._given_up[worker_id] = True
+                self._results[worker_id] = None
+                self._abandon(worker_id)
+                continue
+            if now < self._next_restart[worker_id]:
+                continue
+
+            logger.info(f"Keyshop worker {worker_id} exited with {process.exitcode}, restarting")
+            self.stats[worker_id]["restarts"] += 1
+            self._crashes[worker_id] += 1
+            self._next_restart[worker_id] = now + backoff_delay(
+                self._crashes[worker_id], WORKER_RESTART_BACKOFF_BASE, WORKER_RESTART_BACKOFF_MAX
+            )
+            self._spawn(worker_id)
+            for owner, job, _ in list(self._pending.values()):
+                if owner == worker_id:
+                    self._jobs[worker_id].put(job)
+
+    def collect_stats(self):
+        """Per-worker totals and throughput since the previous call."""
+        now = time.monotonic()
+        elapsed = max(now - self._window_started, 1e-9)
+        collected = [
+            {**stats, "throughput": window / elapsed, "given_up": self._given_up[worker_id],
+             "pending": sum(1 for owner, _, _ in self._pending.values() if owner == worker_id)}
+            for worker_id, (stats, window) in enumerate(zip(self.stats, self._window))
+        ]
+        self._window = [0] * self.workers
+        self._window_started = now
+        return collected
+
+    def summary(self):
+        return ", ".join(
+            f"w{worker_id} {stats['completed']} ok/{stats['failed']} failed/{stats['timeouts']} timed out "
+            + ("(given up)" if stats["given_up"] else f"({stats['throughput']:.2f}/s, {stats['pending']} pending)")
+            for worker_id, stats in enumerate(self.collect_stats())
+        )
+
+    async def stop(self):
+        """Let the workers finish their jobs, then stop them and the result readers."""
+        for jobs in self._jobs:
+            jobs.put(None)
+        for process in self._processes:
+            await asyncio.to_thread(process.join, WORKER_STOP_TIMEOUT)
+            if process.is_alive():
+                process.terminate()
+        self._stopped = True
+        for _, _, future in self._pending.values():
+            future.cancel()
+        self._pending.clear()
@@ -1,8 +1,13 @@
 import os
 import json
+import asyncio
+import aiohttp
+import numpy as np
 from datetime import datetime, timedelta
 from modules.tax_settings import TAX_SETTINGS
-import requests
+from modules.http_client import create_session
+from modules.logger import get_logger
+from modules.metrics import timed
 from modules.config import (
     CACHE_DURATION_HOURS,
     CACHE_FILE,
@@ -10,37 +15,154 @@ from modules.config import (
     USD_TO_PLN_URL
 )
 
-def get_exchange_rates():
-    """Fetch or retrieve cached exchange rates for EUR/USD and USD/PLN."""
-    # Check if the cache file exists
-    if os.path.exists(CACHE_FILE):
-        with open(CACHE_FILE, "r") as file:
-            cache_data = json.load(file)
-            last_updated = datetime.fromisoformat(cache_data["placeholderValue"])
-            if datetime.now() - last_updated < timedelta(hours=CACHE_DURATION_HOURS):
-                # Return cached rates if still fresh
-                return cache_data["placeholderValue"], cache_data["placeholderValue"]
+logger = get_logger('rates')
+
+
+def fee_arrays(tax_settings):
+    """(fixed_tax_eur, variable_tax) arrays of a fee table, in the table's marketplace order."""
+    return (
+        np.array([fees["fixed_tax_eur"] for fees in tax_settings.values()], dtype=float),
+        np.array([fees["variable_tax"] for fees in tax_settings.values()], dtype=float)
+    )
+
 
-    # Fetch fresh rates if cache is missing or stale
-    eur_to_usd_response = requests.get(EUR_TO_USD_URL)
-    usd_to_pln_response = requests.get(USD_TO_PLN_URL)
+# Marketplaces evaluated by the batch profit engine, their keyshop names and fees in matching order
+MARKETPLACES = list(TAX_SETTINGS)
+MARKETPLACE_SHOPS = [marketplace.lower() for marketplace in MARKETPLACES]
+FIXED_TAX_EUR, VARIABLE_TAX = fee_arrays(TAX_SETTINGS)
 
-    if eur_to_usd_response.status_code != 200 or usd_to_pln_response.status_code != 200:
-        raise Exception("Failed to fetch exchange rates.")
+# Refresh this long before the cached rates expire
+REFRESH_MARGIN = timedelta(minutes=5)
 
-    eur_to_usd_rate = eur_to_usd_response.json()["rates"]["placeholderValue"]
-    usd_to_pln_rate = usd_to_pln_response.json()["rates"]["placeholderValue"]
+# Wait this long before retrying a failed background refresh
+REFRESH_RETRY_SECONDS = 60
 
-    # Save the new rates to the cache file
-    with open(CACHE_FILE, "w") as file:
+# Process-wide snapshot: ((eur_to_usd, usd_to_pln), last_updated). Replaced as a whole, never mutated.
+_snapshot = None
+
+# The refresh currently in flight, shared by every caller
+_refresh_task = None
+
+
+# Cache File Functions
+def _load_cache_file():
+    """Return the snapshot stored in CACHE_FILE, or None if it is missing or unreadable."""
+    if not os.path.exists(CACHE_FILE):
+        return None
+    try:
+        with open(CACHE_FILE, "r") as file:
+            cache_data = json.load(file)
+        last_updated = datetime.fromisoformat(cache_data["last_updated"])
+        return (cache_data["eur_to_usd"], cache_data["usd_to_pln"]), last_updated
+    except (OSError, ValueError, KeyError) as e:
+        logger.info(f"Ignoring unreadable exchange rate cache {CACHE_FILE}: {e}")
+        return None
+
+
+def _save_cache_file(snapshot):
+    """Persist a snapshot atomically so readers never see a half-written file."""
+    (eur_to_usd_rate, usd_to_pln_rate), last_updated = snapshot
+    temp_file = f"{CACHE_FILE}.tmp"
+    with open(temp_file, "w") as file:
         json.dump({
-            "placeholderValue": datetime.now().isoformat(),
-            "placeholderValue": eur_to_usd_rate,
-            "placeholderValue": usd_to_pln_rate
+            "last_updated": last_updated.isoformat(),
+            "eur_to_usd": eur_to_usd_rate,
+            "usd_to_pln": usd_to_pln_rate
         }, file)
+    os.replace(temp_file, CACHE_FILE)
+
+
+def _is_fresh(snapshot):
+    return datetime.now() - snapshot[1] < timedelta(hours=CACHE_DURATION_HOURS)
+
+
+# Exchange Rate Functions
+def get_exchange_rates():
+    """Return cached (eur_to_usd, usd_to_pln) rates from memory.
+
+    Only the very first call of a process without a usable cache file reads the disk or the network.
+    """
+    global _snapshot
+    if _snapshot is None:
+        _snapshot = _load_cache_file()
+        if _snapshot is None or not _is_fresh(_snapshot):
+            _snapshot = _fetch_exchange_rates_blocking()
+    return _snapshot[0]
+
+
+def _fetch_exchange_rates_blocking():
+    """Fetch fresh rates synchronously; used only when nothing is cached yet and no event loop is running."""
+    async def fetch():
+        async with create_session() as session:
+            return await _fetch_rates(session)
 
-    return eur_to_usd_rate, usd_to_pln_rate
+    snapshot = (asyncio.run(fetch()), datetime.now())
+    _save_cache_file(snapshot)
+    return snapshot
 
+
+async def _fetch_rate(session, url, currency):
+    async with session.get(url) as response:
+        if response.status != 200:
+            raise aiohttp.ClientResponseError(
+                response.request_info, response.history, status=response.status,
+                message="Failed to fetch exchange rates."
+            )
+        return (await response.json(content_type=None))["rates"][currency]
+
+
+async def _fetch_rates(session):
+    """Return (eur_to_usd, usd_to_pln) from the exchange rate API."""
+    return tuple(await asyncio.gather(
+        _fetch_rate(session, EUR_TO_USD_URL, "USD"),
+        _fetch_rate(session, USD_TO_PLN_URL, "PLN")
+    ))
+
+
+async def _refresh_exchange_rates(session):
+    global _snapshot
+    eur_to_usd_rate, usd_to_pln_rate = await _fetch_rates(session)
+    snapshot = ((eur_to_usd_rate, usd_to_pln_rate), datetime.now())
+    await asyncio.to_thread(_save_cache_file, snapshot)
+    _snapshot = snapshot
+    logger.info(f"Exchange rates refreshed: EUR/USD {eur_to_usd_rate}, USD/PLN {usd_to_pln_rate}")
+    return snapshot[0]
+
+
+async def refresh_exchange_rates(session):
+    """Fetch fresh rates, sharing a single request between concurrent callers."""
+    global _refresh_task
+    if _refresh_task is None or _refresh_task.done():
+        _refresh_task = asyncio.ensure_future(_refresh_exchange_rates(session))
+    return await asyncio.shield(_refresh_task)
+
+
+async def load_exchange_rates(session):
+    """Load the rates into memory without blocking the event loop."""
+    global _snapshot
+    if _snapshot is None:
+        _snapshot = await asyncio.to_thread(_load_cache_file)
+    if _snapshot is None or not _is_fresh(_snapshot):
+        await refresh_exchange_rates(session)
+    return _snapshot[0]
+
+
+async def run_exchange_rate_refresher(session):
+    """Keep the in-memory rates fresh by refreshing shortly before they expire."""
+    while True:
+        expires_at = _snapshot[1] + timedelta(hours=CACHE_DURATION_HOURS) - REFRESH_MARGIN
+        delay = (expires_at - datetime.now()).total_seconds()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        try:
+            await refresh_exchange_rates(session)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError) as e:
+            # Keep serving the previous rates and try again later
+            logger.info(f"Failed to refresh exchange rates: {e}")
+            await asyncio.sleep(REFRESH_RETRY_SECONDS)
+
+
+@timed("calculate_profit")
 def calculate_profit(price_zl, platform, exchange_rates):
     """Calculate the profit after tax for Kinguin or G2A."""
     eur_to_usd_rate, usd_to_pln_rate = exchange_rates
@@ -50,8 +172,27 @@ def calculate_profit(price_zl, platform, exchange_rates):
         raise ValueError(f"Unknown platform: {platform}")
 
     platform_tax = TAX_SETTINGS[platform]
-    fixed_tax_pln = platform_tax["placeholderValue"] * exchange_rate
-    variable_tax_pln = platform_tax["placeholderValue"] * price_zl
+    fixed_tax_pln = platform_tax["fixed_tax_eur"] * exchange_rate
+    variable_tax_pln = platform_tax["variable_tax"] * price_zl
 
     profit = price_zl - fixed_tax_pln - variable_tax_pln
     return profit
+
+
+@timed("calculate_profits")
+def calculate_profits(buy_prices, sell_prices, exchange_rates, fees=(FIXED_TAX_EUR, VARIABLE_TAX)):
+    """Calculate net profit for every (listing, marketplace) pair in one pass.
+
+    `buy_prices` has one PLN price per listing, `sell_prices` one row per listing with a PLN
+    price per marketplace of `fees` (NaN where the shop has no offer). Missing offers yield NaN.
+    `fees` is a (fixed_tax_eur, variable_tax) pair of arrays as built by fee_arrays; it defaults
+    to the fees of MARKETPLACES.
+    """
+    eur_to_usd_rate, usd_to_pln_rate = exchange_rates
+    exchange_rate = eur_to_usd_rate * usd_to_pln_rate  # EUR to PLN
+    fixed_tax_eur, variable_tax = fees
+
+    buy_prices = np.asarray(buy_prices, dtype=float)
+    sell_prices = np.asarray(sell_prices, dtype=float).reshape(len(buy_prices), len(fixed_tax_eur))
+
+    return sell_prices * (1 - variable_tax) - fixed_tax_eur * exchange_rate - buy_prices[:, None]
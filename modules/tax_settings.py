@@ -1,4 +1,5 @@
-# Constants for Kinguin and G2A Tax Formulas
+# Constants for marketplace Tax Formulas
+# Keys must match the keyshop names on gg.deals (case-insensitive); every entry is evaluated by the profit engine
 TAX_SETTINGS = {
     "Kinguin": {
         "fixed_tax_eur": 0.15,  # Fixed tax in EUR
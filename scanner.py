@@ -1,237 +1,745 @@
 import aiohttp
 import asyncio
-import sqlite3
-from bs4 import BeautifulSoup
+import signal
+import time
+import numpy as np
+from collections import OrderedDict
 from datetime import datetime, timezone, timedelta
-from modules.discord_notification import send_discord_notification
-from modules.get_cookies import get_gg_deals_session
-from modules.tax_calculations import calculate_profit, get_exchange_rates
-from modules.database import initialize_database, save_to_database
-from modules.extract import extract_drm_from_listing, extract_listing_details
+from urllib.parse import urlparse
+from modules.discord_notification import send_discord_notification, dispatcher
+from modules.get_cookies import get_session_credentials, refresh_session_credentials
+from modules.http_client import create_session, keyshop_headers, collect_stats as collect_http_stats
+from modules.tax_calculations import (
+    MARKETPLACE_SHOPS,
+    calculate_profits,
+    get_exchange_rates,
+    load_exchange_rates,
+    run_exchange_rate_refresher
+)
+from modules.database import (
+    initialize_database,
+    save_to_database,
+    flush_database,
+    load_scanner_state,
+    save_scanner_state,
+    load_price_history,
+    save_price_history
+)
+from modules.extract import (
+    listing_region_digest,
+    parse_keyshops,
+    parse_listings,
+    shutdown_parse_executor,
+    start_parse_executor
+)
+from modules.adaptive_poll import AdaptiveInterval
+from modules.anomaly import PriceHistory
+from modules.archive import run_archiver
+from modules.keyshop_cache import KeyshopBounds, KeyshopCache
 from modules.logger import get_logger
-import pygame
-import logging
-import os
+from modules.metrics import timed, increment, iteration_summary, start_metrics_server
+from modules.pipeline import Pipeline, Stage
+from modules.scheduler import RequestScheduler, backoff_delay
+from modules.sharding import KeyshopShards
 from modules.config import (
     NOTIFICATION_SOUND,
     REFRESH_RATE,
     MIN_PROFIT,
     MIN_PRICE,
     SOUND_PROFIT,
-    BASE_URL
+    BASE_URL,
+    KEYSHOP_CACHE_TTL,
+    KEYSHOP_CACHE_SIZE,
+    KEYSHOP_MAX_IN_FLIGHT,
+    KEYSHOP_RATE_LIMIT,
+    KEYSHOP_BURST,
+    KEYSHOP_BOUND_MAX_AGE,
+    KEYSHOP_BOUND_MARGIN,
+    KEYSHOP_WORKERS,
+    RETRY_BACKOFF_BASE,
+    RETRY_BACKOFF_MAX,
+    FEEDS,
+    MAX_PAGES,
+    PAGE_CONCURRENCY,
+    MIN_REFRESH_RATE,
+    MAX_REFRESH_RATE,
+    ARRIVAL_EWMA_ALPHA,
+    PARSE_WORKERS,
+    PIPELINE_QUEUE_SIZE,
+    PIPELINE_DRAIN_TIMEOUT,
+    SEEN_LISTINGS_KEPT,
+    ARCHIVE_AFTER_DAYS,
+    ANOMALY_MIN_SAMPLES,
+    ANOMALY_ZSCORE,
+    ANOMALY_ONLY,
+    PRICE_HISTORY_SNAPSHOT_INTERVAL,
+    METRICS_PORT,
+    METRICS_SUMMARY
 )
 
-# Create 'debug' folder if it doesn't exist
-os.makedirs('debug', exist_ok=True)
-
-# Create a logging object
+# Create a logging object (the debug folder is created on the first log record)
 logger = get_logger('main')
 
-# Initialize pygame for sound notifications
-pygame.init()
-
 # Constants
-LIST_URL = f"{BASE_URL}/deals/new-deals/"
 KEYSHOP_URL_TEMPLATE = f"{BASE_URL}/pl/games/keyshopsDeals/{{game_id}}/"
+KEYSHOP_HOST = urlparse(BASE_URL).netloc
+FEED_URLS = [f"{BASE_URL}{path}" for path in FEEDS]
+
+# Status codes gg.deals answers with when the session or CSRF token is no longer valid
+SESSION_EXPIRED_STATUSES = (403, 419)
 
-# Global variable to track the last check time
-last_check = datetime.now(timezone.utc) - timedelta(minutes=45)  # Initialize to start 10 mins in the past
+# pygame, imported and initialized by the first sound alert
+_pygame = None
 
-# Initialize cookies and CSRF token
-gg_session, gg_csrf, csrf_token = get_gg_deals_session()
 
-# Create cookies dictionary for requests
-SESSION_COOKIES = {
-    "gg-session": gg_session,
-    "gg_csrf": gg_csrf
-}
+def play_notification_sound():
+    """Play the alert sound; pygame is slow to import, so it is only loaded when first needed."""
+    global _pygame
+    if _pygame is None:
+        import pygame
+        pygame.init()
+        _pygame = pygame
+    _pygame.mixer.Sound(NOTIFICATION_SOUND).play()
+
 
 # Fetch Functions
+@timed("fetch_html")
 async def fetch_html(session, url):
-    async with session.get(url) as response:
-        if response.status != 200:
+    """Fetch a page as raw bytes; parsing decodes it."""
+    try:
+        async with session.get(url) as response:
+            if response.status == 200:
+                return await response.read()
             logger.info(f"Failed to fetch {url}")
-            return None
-        return await response.text()
-
-async def fetch_listings(session):
-    html_content = await fetch_html(session, LIST_URL)
-    if not html_content:
-        return []
-
-    # Get exchange rates and calculate USD-to-PLN
-    exchange_rates = get_exchange_rates()
-    usd_to_pln = exchange_rates[1]
-
-    soup = BeautifulSoup(html_content, 'html.parser')
-    listings = soup.find_all('div', class_='hoverable-box')
-
-    extracted_listings = []
-    for listing in listings:
-        listing_html = str(listing)
-        game_id = listing.get('data-container-game-id')
-        drm = extract_drm_from_listing(listing_html)
-        game_name, listing_url, price = extract_listing_details(listing_html)
-
-        if not drm:
-            continue
-
-        time_tag = listing.find('time')
-        if not time_tag:
-            continue
-
-        listing_time = datetime.fromisoformat(time_tag['datetime']).astimezone(timezone.utc)
-
-        # Convert current price to PLN
-        current_price_pln = price * usd_to_pln
-
-        extracted_listings.append({
-            "game_id": game_id,
-            "game_name": game_name,
-            "listing_url": listing_url,
-            "current_price": current_price_pln,  # Store price in PLN
-            "listing_time": listing_time,
-            "drm": drm
-        })
-
-    return extracted_listings
-
-
-
-async def fetch_keyshops(session, game_id, listing_drm, retries=3):
-    """Fetch keyshop prices for a game with retry logic."""
-    keyshop_url = KEYSHOP_URL_TEMPLATE.format(game_id=game_id)
-    payload = {'gg_csrf': csrf_token}
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
-        'Referer': LIST_URL,
-        'X-CSRF-Token': csrf_token,
-        'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8',
-        'Origin': BASE_URL,
-        'x-requested-with': 'XMLHttpRequest'
-    }
-
-    for attempt in range(retries):
-        try:
-            async with session.post(keyshop_url, data=payload, headers=headers, cookies=SESSION_COOKIES) as response:
-                if response.status == 200:
-                    html_content = await response.text()
-                    soup = BeautifulSoup(html_content, 'html.parser')
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.info(f"Connection error while fetching {url}: {e}")
+    increment("page_fetch_failures")
+    return None
 
-                    keyshops = []
-                    keyshop_divs = soup.select('div[data-shops-names]')
-                    for shop in keyshop_divs:
-                        shop_name = shop.get('data-shops-names', '').lower()
-                        price = shop.get('data-deals-value')
-                        drm = extract_drm_from_listing(str(shop))
 
-                        if not drm or drm != listing_drm:
-                            continue
+class Scanner:
+    """Polls the deal feeds and streams new listings through the keyshop, profit and notify stages.
 
-                        keyshops.append({"name": shop_name, "price": float(price), "drm": drm})
+    All scanner state lives on the instance, so creating one is cheap and importing this
+    module has no side effects. Thresholds can be overridden after construction.
+    """
+
+    def __init__(self):
+        # Time of the newest handled listing per feed URL, restored from the database on start
+        self.watermarks = {}
+
+        # Where feeds without a saved watermark start
+        self.default_watermark = datetime.now(timezone.utc) - timedelta(minutes=45)
+
+        # Keys of recently handled listings (oldest first), so listings sharing a watermark's time are handled once
+        self.seen_listings = OrderedDict()
+
+        # Listings still in the pipeline ({key: (feed_url, listing_time)}) and those that left it since the last save;
+        # only finished listings are persisted, so a restart handles the rest (including any lost to a stage error) again
+        self.in_flight = {}
+        self.finished = []
+        self.saved_watermarks = {}
+
+        # Conditional-GET validators and listing digest of the last processed first page, per feed URL
+        self.list_page_state = {}
+
+        # Poll ticks that were skipped because the list page had not changed
+        self.tick_stats = {"skipped": 0, "processed": 0}
+
+        # Keyshop results shared between listings of the same game and DRM
+        self.keyshop_cache = KeyshopCache(KEYSHOP_CACHE_TTL, KEYSHOP_CACHE_SIZE)
+
+        # Last known marketplace prices, to skip lookups that cannot be profitable (keyshop_bound_max_age = 0 disables)
+        self.keyshop_bounds = KeyshopBounds(KEYSHOP_BOUND_MAX_AGE, KEYSHOP_CACHE_SIZE * 16)
+        self.bound_margin = KEYSHOP_BOUND_MARGIN
+
+        # Bounds concurrency and request rate of keyshop lookups
+        self.keyshop_scheduler = RequestScheduler(KEYSHOP_MAX_IN_FLIGHT, KEYSHOP_RATE_LIMIT, KEYSHOP_BURST)
+
+        # Poll interval that follows the observed deal arrival rate
+        self.poll_interval = AdaptiveInterval(REFRESH_RATE, MIN_REFRESH_RATE, MAX_REFRESH_RATE, ARRIVAL_EWMA_ALPHA)
+
+        # Cookies and CSRF token, reused from the last run or fetched when the scanner starts
+        self.session_credentials = {}
+
+        # Running mean/variance of listed prices per game and DRM, to spot listings far below their history
+        self.price_history = PriceHistory(ANOMALY_MIN_SAMPLES, ANOMALY_ZSCORE)
+
+        # Skip keyshop lookups for listings whose history shows nothing unusual
+        self.anomaly_only = ANOMALY_ONLY
+
+        self.min_price = MIN_PRICE
+        self.min_profit = MIN_PROFIT
+        self.sound_profit = SOUND_PROFIT
+        self.metrics_port = METRICS_PORT
+
+        # Worker processes for keyshop lookups; 0 looks them up in this process
+        self.keyshop_workers = KEYSHOP_WORKERS
+        self.shards = None
+
+        self.session = None
+        self.pipeline = None
+
+    # Scanner State
+    def watermark(self, feed_url):
+        return self.watermarks.get(feed_url, self.default_watermark)
+
+    @property
+    def last_check(self):
+        """The oldest feed watermark."""
+        return min((self.watermark(feed_url) for feed_url in FEED_URLS), default=self.default_watermark)
+
+    @staticmethod
+    def listing_key(listing):
+        return listing["game_id"], listing["listing_url"], listing["listed_price"]
+
+    def is_new(self, listing):
+        """True for listings not older than their feed's watermark that have not been handled yet."""
+        return (listing["listing_time"] >= self.watermark(listing["feed"])
+                and self.listing_key(listing) not in self.seen_listings)
+
+    def remember(self, keys):
+        for key in keys:
+            self.seen_listings[key] = None
+            self.seen_listings.move_to_end(key)
+        while len(self.seen_listings) > SEEN_LISTINGS_KEPT:
+            self.seen_listings.popitem(last=False)
+
+    async def load_state(self):
+        """Resume from the watermarks and seen listings saved by the previous run."""
+        watermarks, seen_keys = await asyncio.to_thread(load_scanner_state, SEEN_LISTINGS_KEPT)
+        self.watermarks.update(watermarks)
+        self.saved_watermarks.update(watermarks)
+        self.remember(seen_keys)
+        self.price_history.load(await asyncio.to_thread(load_price_history))
+        if watermarks:
+            logger.info(f"Resuming from saved state: {len(watermarks)} feed watermarks, {len(seen_keys)} seen listings, "
+                        f"price history of {len(self.price_history)} games.")
+
+    def finish_listings(self, listings):
+        """Mark listings as having left the pipeline, whether notified or dropped."""
+        if not self.in_flight:
+            return  # Stages called outside the pipeline (e.g. by the benchmarks)
+        for listing in listings:
+            key = self.listing_key(listing)
+            if self.in_flight.pop(key, None) is not None:
+                self.finished.append((key, listing["listing_time"]))
+
+    async def save_state(self):
+        """Persist the finished listings and, per feed, a watermark no listing still in the pipeline is older than."""
+        watermarks = dict(self.watermarks)
+        for feed_url, listing_time in self.in_flight.values():
+            if feed_url in watermarks:
+                watermarks[feed_url] = min(watermarks[feed_url], listing_time)
+        advanced = {feed_url: last_check for feed_url, last_check in watermarks.items()
+                    if self.saved_watermarks.get(feed_url) != last_check}
+        if not advanced and not self.finished:
+            return
+
+        finished, self.finished = self.finished, []
+        await asyncio.to_thread(save_scanner_state, advanced, finished, SEEN_LISTINGS_KEPT)
+        self.saved_watermarks.update(advanced)
+
+    async def save_price_history(self):
+        """Persist the price history of games that changed since the last snapshot."""
+        rows = self.price_history.take_snapshot()
+        if rows:
+            await asyncio.to_thread(save_price_history, rows)
+
+    async def run_price_history_snapshots(self):
+        while True:
+            await asyncio.sleep(PRICE_HISTORY_SNAPSHOT_INTERVAL)
+            await self.save_price_history()
+
+    async def refresh_credentials(self, stale_token):
+        """Refresh the session unless another request already replaced `stale_token`."""
+        if self.session_credentials.get("csrf_token") == stale_token:
+            self.session_credentials.update(await refresh_session_credentials(self.session))
+            increment("session_refreshes")
+
+    # Fetch Functions
+    @timed("fetch_list_page")
+    async def fetch_list_page(self, url):
+        """Fetch the first page of a feed, returning None when it has not changed since the last tick."""
+        state = self.list_page_state.setdefault(url, {"etag": None, "last_modified": None, "digest": None})
+        headers = {}
+        if state["etag"]:
+            headers['If-None-Match'] = state["etag"]
+        if state["last_modified"]:
+            headers['If-Modified-Since'] = state["last_modified"]
 
-                    kinguin_price = next((shop['prices'] for shop in keyshops if shop['name'] == 'kinguin'), None)
-                    g2a_price = next((shop['prices'] for shop in keyshops if shop['name'] == 'g2a'), None)
+        try:
+            async with self.session.get(url, headers=headers) as response:
+                if response.status == 304:
+                    return None
+                if response.status != 200:
+                    logger.info(f"Failed to fetch {url}")
+                    increment("page_fetch_failures")
+                    return b""
+
+                state["etag"] = response.headers.get('ETag')
+                state["last_modified"] = response.headers.get('Last-Modified')
+                html_content = await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.info(f"Connection error while fetching {url}: {e}")
+            increment("page_fetch_failures")
+            return b""
+
+        # The page carries per-request noise, so compare only the listing region
+        digest = listing_region_digest(html_content)
+        if digest == state["digest"]:
+            return None
+        state["digest"] = digest
 
-                    return {"kinguin_price": kinguin_price, "g2a_price": g2a_price}
+        return html_content
 
-                logger.info(f"Attempt {attempt + 1}: Failed to fetch keyshops for game ID {game_id}, status: {response.status}")
-        except (aiohttp.ClientError, ConnectionResetError) as e:
-            logger.info(f"Attempt {attempt + 1}: Connection error while fetching keyshops for game ID {game_id}: {e}")
+    def reaches_watermark(self, listings, feed_url):
+        """True when a page is empty or already contains listings seen by an earlier tick."""
+        return not listings or min(listing["listing_time"] for listing in listings) <= self.watermark(feed_url)
 
-        await asyncio.sleep(1)  # Add a short delay between retries
+    async def crawl_feed(self, feed_url, usd_to_pln):
+        """Fetch a feed page by page until it reaches listings older than the feed's watermark.
 
-    logger.info(f"Failed to fetch keyshops for game ID {game_id} after {retries} attempts.")
-    return None
+        Returns None when the feed's first page has not changed since the last tick.
+        """
+        html_content = await self.fetch_list_page(feed_url)
+        if html_content is None:
+            return None
 
+        listings = await parse_listings(html_content, usd_to_pln) if html_content else []
+        crawled = list(listings)
+        page = 2
+        pages_crawled = 1
+
+        # Follow pagination a few pages at a time while every listing is still new
+        while not self.reaches_watermark(listings, feed_url) and page <= MAX_PAGES:
+            page_numbers = range(page, min(page + PAGE_CONCURRENCY, MAX_PAGES + 1))
+            pages = await asyncio.gather(*[
+                fetch_html(self.session, f"{feed_url}?page={number}") for number in page_numbers
+            ])
+            parsed_pages = await asyncio.gather(*[
+                parse_listings(html_content or b"", usd_to_pln) for html_content in pages
+            ])
+            for listings in parsed_pages:
+                crawled.extend(listings)
+                pages_crawled += 1
+                if self.reaches_watermark(listings, feed_url):
+                    break
+            page += len(page_numbers)
+
+        if pages_crawled > 1:
+            logger.info(f"Crawled {pages_crawled} pages of {feed_url}")
+        return crawled
+
+    async def fetch_listings(self):
+        """Fetch and parse new listings from every feed, returning None when all feeds are unchanged."""
+        # Get exchange rates and calculate USD-to-PLN
+        exchange_rates = get_exchange_rates()
+        usd_to_pln = exchange_rates[1]
+
+        feeds = await asyncio.gather(*[self.crawl_feed(feed_url, usd_to_pln) for feed_url in FEED_URLS])
+        if all(listings is None for listings in feeds):
+            return None
 
-async def process_listing(session, listing):
-    """Process a single listing."""
-    game_id = listing["game_id"]
-    game_name = listing["game_name"]
-    drm = listing["drm"]
-    listing_url = listing["listing_url"]
-    current_price = listing["current_price"]  # Already in PLN
-
-    # Get exchange rates and calculate USD-to-PLN
-    exchange_rates = get_exchange_rates()
-    usd_to_pln = exchange_rates[1]
-
-    # Ensure the current price meets the minimum price criteria
-    if current_price < MIN_PRICE:
-        logger.info(f"Skipping {game_name} due to price below MIN_PRICE: {current_price:.2f} PLN")
-        return
-
-    # Save to database
-    save_to_database(game_id, game_name, drm, current_price, listing_url)
-    logger.info(f"Saved listing: {game_name} ({drm}, {current_price:.2f} PLN)")
-
-    # Fetch keyshop prices
-    keyshop_data = await fetch_keyshops(session, game_id, drm)
-    if not keyshop_data:
-        logger.info(f"No keyshop data for {game_name}")
-        return
-
-    kinguin_price = keyshop_data['kinguin_price']
-    g2a_price = keyshop_data['g2a_price']
-
-    # Convert keyshop prices to PLN
-    kinguin_price_pln = kinguin_price * usd_to_pln if kinguin_price else None
-    g2a_price_pln = g2a_price * usd_to_pln if g2a_price else None
-
-    # Calculate profits
-    kinguin_profit = (
-        calculate_profit(kinguin_price_pln, "Kinguin", exchange_rates) - current_price
-        if kinguin_price_pln
-        else None
-    )
-    g2a_profit = (
-        calculate_profit(g2a_price_pln, "G2A", exchange_rates) - current_price
-        if g2a_price_pln
-        else None
-    )
-
-    # Determine if a Discord notification should be sent
-    if max(kinguin_profit or 0, g2a_profit or 0) >= MIN_PROFIT:
-        send_discord_notification({
-            "name": game_name,
-            "game_id": game_id,
-            "price": current_price,  # Send price in PLN
-            "kinguin_price": kinguin_price_pln,
-            "g2a_price": g2a_price_pln,
-            "drm": drm,
-            "listing_url": listing_url
-        })
-
-    # Sound notification for high profits
-    max_profit = max(kinguin_profit or 0, g2a_profit or 0)
-    if max_profit >= SOUND_PROFIT:
-        logger.info(f"[Massive Profit!] {game_name} | Max Profit: {max_profit:.2f} PLN")
-        pygame.mixer.Sound(NOTIFICATION_SOUND).play()
-
-
-async def check_new_listings():
-    global last_check
-    async with aiohttp.ClientSession() as session:
+        # The same deal can show up in several feeds or shift between pages while crawling
+        seen = set()
+        extracted_listings = []
+        for feed_url, listings in zip(FEED_URLS, feeds):
+            for listing in listings or []:
+                key = (listing["game_id"], listing["listing_url"], listing["drm"])
+                if key not in seen:
+                    listing["feed"] = feed_url
+                    seen.add(key)
+                    extracted_listings.append(listing)
+
+        return extracted_listings
+
+    @timed("fetch_keyshops")
+    async def fetch_keyshops(self, game_id, listing_drm, retries=3, priority=1.0):
+        """Fetch keyshop prices for a game with retry logic.
+
+        Requests go through the keyshop scheduler; lower `priority` values are sent first.
+        """
+        keyshop_url = KEYSHOP_URL_TEMPLATE.format(game_id=game_id)
+
+        for attempt in range(retries):
+            retry_after = None
+            csrf_token = self.session_credentials["csrf_token"]
+            payload = {'gg_csrf': csrf_token}
+            headers = keyshop_headers(csrf_token)
+            cookies = {
+                name: value for name, value in (
+                    ("gg-session", self.session_credentials["gg_session"]),
+                    ("gg_csrf", self.session_credentials["gg_csrf"])
+                ) if value
+            }
+            try:
+                async with self.keyshop_scheduler.slot(KEYSHOP_HOST, priority), \
+                        self.session.post(keyshop_url, data=payload, headers=headers, cookies=cookies) as response:
+                    if response.status == 200:
+                        html_content = await response.read()
+                        keyshops = await parse_keyshops(html_content, listing_drm)
+
+                        # First (cheapest listed) offer per shop
+                        prices = {}
+                        for shop in keyshops:
+                            prices.setdefault(shop['name'], shop['price'])
+
+                        return {"kinguin_price": prices.get('kinguin'), "g2a_price": prices.get('g2a'), "prices": prices}
+
+                    retry_after = response.headers.get('Retry-After')
+                    logger.info(f"Attempt {attempt + 1}: Failed to fetch keyshops for game ID {game_id}, status: {response.status}")
+                    session_expired = response.status in SESSION_EXPIRED_STATUSES
+            except (aiohttp.ClientError, asyncio.TimeoutError, ConnectionResetError) as e:
+                logger.info(f"Attempt {attempt + 1}: Connection error while fetching keyshops for game ID {game_id}: {e}")
+                session_expired = False
+
+            if attempt + 1 < retries:
+                increment("keyshop_retries")
+
+            if session_expired:
+                try:
+                    await self.refresh_credentials(csrf_token)
+                    continue  # Retry right away with the new credentials
+                except RuntimeError as e:
+                    logger.info(f"Could not refresh session credentials: {e}")
+
+            if attempt + 1 < retries:
+                # Back off exponentially with jitter, honoring Retry-After on 429/503
+                await asyncio.sleep(backoff_delay(attempt, RETRY_BACKOFF_BASE, RETRY_BACKOFF_MAX, retry_after))
+
+        logger.info(f"Failed to fetch keyshops for game ID {game_id} after {retries} attempts.")
+        increment("keyshop_failures")
+        return None
+
+    # Pipeline Stages
+    async def filter_listings(self, batches):
+        """Keep listings not handled before, advance the watermarks and rank the listings against their price history."""
+        new_listings = []
+        for listings in batches:
+            new = [listing for listing in listings if self.is_new(listing)]
+            for listing in new:
+                # Advance each feed's watermark to its latest listing's time
+                feed_url = listing["feed"]
+                if listing["listing_time"] > self.watermark(feed_url):
+                    self.watermarks[feed_url] = listing["listing_time"]
+                self.in_flight[self.listing_key(listing)] = (feed_url, listing["listing_time"])
+            self.remember(self.listing_key(listing) for listing in new)
+            new_listings.extend(listing for listing in new if listing["current_price"] >= self.min_price)
+            self.finish_listings(listing for listing in new if listing["current_price"] < self.min_price)
+
+        for listing in new_listings:
+            # Price relative to history (before this listing joins it); the cheapest candidates get keyshop slots first
+            game_id, drm, price = listing["game_id"], listing["drm"], listing["current_price"]
+            average_price = self.price_history.mean(game_id, drm)
+            listing["priority"] = price / average_price if average_price else 1.0
+            listing["price_zscore"] = self.price_history.zscore(game_id, drm, price)
+            listing["anomaly"] = self.price_history.is_anomaly(listing["price_zscore"])
+            self.price_history.update(game_id, drm, price)
+            if listing["anomaly"]:
+                logger.info(f"[Price Anomaly] {listing['game_name']} ({drm}) at {price:.2f} PLN is "
+                            f"{-listing['price_zscore']:.1f} std below its average of {average_price:.2f} PLN")
+                increment("price_anomalies")
+
+        increment("listings_new", len(new_listings))
+        return new_listings
+
+    async def store_listings(self, listings):
+        """Queue listings for the database writer thread."""
+        for listing in listings:
+            save_to_database(listing["game_id"], listing["game_name"], listing["drm"], listing["current_price"], listing["listing_url"])
+            logger.info(f"Saved listing: {listing['game_name']} ({listing['drm']}, {listing['current_price']:.2f} PLN)")
+        return listings
+
+    async def bound_listings(self, listings):
+        """Drop listings whose best profit at the last known keyshop prices cannot reach the thresholds.
+
+        Keyshop prices may have risen since they were recorded, so they count `bound_margin` higher.
+        Listings without recent known prices always go on to a lookup.
+        """
+        if not self.keyshop_bounds.max_age:
+            return listings
+
+        known = []
+        candidates = []
+        for listing in listings:
+            prices = self.keyshop_bounds.get((listing["game_id"], listing["drm"]))
+            if prices is None:
+                candidates.append(listing)
+            else:
+                known.append((listing, prices))
+        if not known:
+            return candidates
+
+        exchange_rates = get_exchange_rates()
+        buy_prices = np.array([listing["current_price"] for listing, _ in known])
+        sell_prices = np.array([
+            [prices.get(shop, np.nan) for shop in MARKETPLACE_SHOPS] for _, prices in known
+        ]) * exchange_rates[1] * (1 + self.bound_margin)
+        upper_bounds = calculate_profits(buy_prices, sell_prices, exchange_rates)
+
+        # NaN (no marketplace offer) never reaches a threshold, like in evaluate_listings
+        threshold = min(self.min_profit, self.sound_profit)
+        reachable = (upper_bounds >= threshold).any(axis=1)
+        for (listing, _), keep in zip(known, reachable):
+            if keep:
+                candidates.append(listing)
+            else:
+                self.finish_listings([listing])
+                self.keyshop_bounds.stats["skipped"] += 1
+                increment("keyshop_lookups_bounded")
+        return candidates
+
+    async def fetch_listing_keyshops(self, listings):
+        """Attach keyshop prices to listings, dropping those without any."""
+        fetch_keyshops = self.shards.fetch if self.shards else self.fetch_keyshops
+        evaluated = []
+        for listing in listings:
+            game_id = listing["game_id"]
+            drm = listing["drm"]
+
+            # Listings with enough history to judge that are not below it are unlikely to be profitable
+            if self.anomaly_only and listing.get("price_zscore") is not None and not listing["anomaly"]:
+                self.finish_listings([listing])
+                increment("keyshop_lookups_skipped")
+                continue
+
+            # Fetch keyshop prices (cached, and shared with concurrent listings of the same game)
+            keyshop_data = await self.keyshop_cache.get_or_fetch(
+                (game_id, drm), lambda: self.fetch_and_record(fetch_keyshops, game_id, drm, listing.get("priority", 1.0))
+            )
+            if not keyshop_data:
+                logger.info(f"No keyshop data for {listing['game_name']}")
+                self.finish_listings([listing])
+                increment("listings_without_keyshops")
+                continue
+            evaluated.append((listing, keyshop_data))
+        return evaluated
+
+    async def fetch_and_record(self, fetch_keyshops, game_id, drm, priority):
+        """Look up keyshops and remember the prices for bounding later listings of the game."""
+        keyshop_data = await fetch_keyshops(game_id, drm, priority=priority)
+        if keyshop_data:
+            self.keyshop_bounds.record((game_id, drm), keyshop_data["prices"])
+        return keyshop_data
+
+    async def evaluate_listings(self, evaluated):
+        """Calculate profits for a batch of listings at once, returning those worth a notification or sound."""
+        # Get exchange rates and calculate USD-to-PLN
+        exchange_rates = get_exchange_rates()
+        usd_to_pln = exchange_rates[1]
+
+        # One row per listing, one column per marketplace; keyshop prices converted to PLN
+        buy_prices = np.array([listing["current_price"] for listing, _ in evaluated])
+        sell_prices = np.array([
+            [keyshop_data["prices"].get(shop, np.nan) for shop in MARKETPLACE_SHOPS]
+            for _, keyshop_data in evaluated
+        ]) * usd_to_pln
+
+        profits = calculate_profits(buy_prices, sell_prices, exchange_rates)
+
+        # Best profit over the marketplaces that have an offer (NaN when none has)
+        has_offer = ~np.isnan(profits).all(axis=1)
+        max_profits = np.full(len(evaluated), np.nan)
+        max_profits[has_offer] = np.nanmax(profits[has_offer], axis=1)
+
+        profitable = []
+        for (listing, keyshop_data), max_profit in zip(evaluated, max_profits):
+            if max_profit >= self.min_profit or max_profit >= self.sound_profit:
+                profitable.append((listing, keyshop_data, max_profit))
+            else:
+                self.finish_listings([listing])
+        return profitable
+
+    async def notify_listings(self, profitable):
+        """Send Discord notifications and play the sound for high profits."""
+        # The price history in the notifications should include these listings
+        await asyncio.to_thread(flush_database)
+
+        usd_to_pln = get_exchange_rates()[1]
+        for listing, keyshop_data, max_profit in profitable:
+            game_name = listing["game_name"]
+            kinguin_price = keyshop_data['kinguin_price']
+            g2a_price = keyshop_data['g2a_price']
+
+            # Determine if a Discord notification should be sent
+            if max_profit >= self.min_profit:
+                send_discord_notification({
+                    "name": game_name,
+                    "game_id": listing["game_id"],
+                    "price": listing["current_price"],  # Send price in PLN
+                    "kinguin_price": kinguin_price * usd_to_pln if kinguin_price else None,
+                    "g2a_price": g2a_price * usd_to_pln if g2a_price else None,
+                    "drm": listing["drm"],
+                    "listing_url": listing["listing_url"]
+                })
+
+            # Sound notification for high profits
+            if max_profit >= self.sound_profit:
+                logger.info(f"[Massive Profit!] {game_name} | Max Profit: {max_profit:.2f} PLN")
+                play_notification_sound()
+                increment("sound_alerts")
+
+        self.finish_listings(listing for listing, _, _ in profitable)
+
+    def build_pipeline(self):
+        """Connect the listing stages with bounded queues: filter -> store -> bounds -> keyshops -> profit -> notify."""
+        return Pipeline(
+            Stage("filter", self.filter_listings, queue_size=10, batch_size=10),
+            Stage("store", self.store_listings, queue_size=PIPELINE_QUEUE_SIZE, batch_size=100),
+            Stage("bounds", self.bound_listings, queue_size=PIPELINE_QUEUE_SIZE, batch_size=100),
+            Stage("keyshops", self.fetch_listing_keyshops, workers=KEYSHOP_MAX_IN_FLIGHT * max(1, self.keyshop_workers),
+                  queue_size=PIPELINE_QUEUE_SIZE, priority=lambda listing: listing.get("priority", 1.0)),
+            Stage("profit", self.evaluate_listings, queue_size=PIPELINE_QUEUE_SIZE, batch_size=100),
+            Stage("notify", self.notify_listings, queue_size=PIPELINE_QUEUE_SIZE, batch_size=10),
+        )
+
+    async def poll_listings(self):
+        """Poll the deal feeds forever and hand every tick's listings to the pipeline."""
         while True:
-            listings = await fetch_listings(session)
-
-            # Filter listings posted after the last check
-            new_listings = [
-                listing for listing in listings
-                if listing["listing_time"] > last_check and listing["current_price"] >= MIN_PRICE
-            ]
-
-            if new_listings:
-                # Update the last check time to the latest listing's time
-                last_check = max(l["listing_time"] for l in new_listings)
-
-            tasks = [process_listing(session, listing) for listing in new_listings]
-            await asyncio.gather(*tasks)
+            iteration_started = time.monotonic()
+
+            listings = await self.fetch_listings()
+            if listings is None:
+                self.tick_stats["skipped"] += 1
+                increment("ticks_skipped")
+                self.poll_interval.observe([], datetime.now(timezone.utc))
+                logger.info(f"List page unchanged, skipping iteration ({self.tick_stats['skipped']} skipped, {self.tick_stats['processed']} processed).")
+                # Listings of earlier ticks keep finishing in the pipeline while the page is unchanged
+                await self.save_state()
+                await asyncio.sleep(self.poll_interval.sleep_time(time.monotonic() - iteration_started))
+                continue
+            self.tick_stats["processed"] += 1
+            increment("ticks_processed")
+
+            # Every listing not handled before counts towards the arrival rate
+            self.poll_interval.observe(
+                [listing["listing_time"] for listing in listings if self.is_new(listing)],
+                datetime.now(timezone.utc)
+            )
+
+            # Blocks only when the filter stage is full (backpressure)
+            await self.pipeline.put(listings)
+
+            scheduler_stats = self.keyshop_scheduler.collect_stats()
+            sleep_time = self.poll_interval.sleep_time(time.monotonic() - iteration_started)
+            detect_percentiles = self.poll_interval.detect_percentiles()
+            detect_summary = (
+                "p50 {:.1f}s, p90 {:.1f}s, p99 {:.1f}s".format(*detect_percentiles) if detect_percentiles else "n/a"
+            )
+            cache_stats = self.keyshop_cache.stats
+            http_stats = collect_http_stats()
+            reuse_summary = f"{http_stats['reuse_ratio']:.0%}" if http_stats["reuse_ratio"] is not None else "n/a"
+
+            logger.info(f"Iteration finished, starting again in {sleep_time:.1f} seconds (interval {self.poll_interval.interval:.1f}s). "
+                        f"Last check {self.last_check}. Time to detect: {detect_summary}. "
+                        f"Ticks: {self.tick_stats['processed']} processed, {self.tick_stats['skipped']} skipped. "
+                        f"Pipeline: {self.pipeline.summary()}. "
+                        f"Keyshop cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                        f"{cache_stats['coalesced']} coalesced, {len(self.keyshop_cache)} entries. "
+                        f"Keyshop bounds: {self.keyshop_bounds.stats['skipped']} lookups skipped, "
+                        f"{self.keyshop_bounds.stats['stale']} forced refreshes. "
+                        f"Keyshop requests: {scheduler_stats['completed']} sent ({scheduler_stats['throughput']:.2f}/s), "
+                        f"queue depth {scheduler_stats['queue_depth']} (peak {scheduler_stats['peak_queue_depth']}). "
+                        f"Notifications: {dispatcher.stats['sent']} sent in {dispatcher.stats['messages']} messages, "
+                        f"{dispatcher.queue_depth} queued, {dispatcher.stats['failed']} failed. "
+                        f"HTTP: {http_stats['requests']} requests, connection reuse {reuse_summary}, "
+                        f"{http_stats['connections_created']} new connections, {http_stats['tls_handshakes']} TLS handshakes.")
+            if self.shards:
+                self.shards.check_workers()
+                logger.info(f"Keyshop workers: {self.shards.summary()}")
+            if METRICS_SUMMARY:
+                logger.info(f"Metrics: {iteration_summary()}")
+            await self.save_state()
+            await asyncio.sleep(sleep_time)  # Sleep for what is left of the poll interval
+
+    async def run(self):
+        """Open the shared HTTP session, start the background services and poll until cancelled."""
+        async with create_session() as session:
+            self.session = session
+            dispatcher.start(session)
+
+            # Reuse saved credentials when possible; Selenium is only the last resort
+            self.session_credentials.update(await get_session_credentials(session))
+
+            # Pick up where the previous run stopped
+            await self.load_state()
+
+            # Parse pages in worker processes so the event loop keeps fetching
+            start_parse_executor(PARSE_WORKERS)
+
+            # Rates live in memory and are refreshed in the background before they expire
+            await load_exchange_rates(session)
+            rates_refresher = asyncio.create_task(run_exchange_rate_refresher(session))
+
+            # Old listings move to the columnar archive in the background (archive_after_days = 0 keeps them)
+            archiver = asyncio.create_task(run_archiver()) if ARCHIVE_AFTER_DAYS else None
+            history_snapshots = asyncio.create_task(self.run_price_history_snapshots())
+
+            # Keyshop lookups go to worker processes, each with its own session, when configured
+            if self.keyshop_workers:
+                self.shards = KeyshopShards(self.keyshop_workers)
+                self.shards.start()
+
+            self.pipeline = self.build_pipeline()
+            self.pipeline.start()
+
+            # Local Prometheus endpoint; metrics_port = 0 disables it
+            metrics_server = await start_metrics_server(self.metrics_port) if self.metrics_port else None
+
+            # SIGTERM stops polling like Ctrl+C, so the pipeline is drained and the state saved below
+            terminated = False
+            main_task = asyncio.current_task()
+
+            def terminate():
+                nonlocal terminated
+                terminated = True
+                main_task.cancel()
+
+            loop = asyncio.get_running_loop()
+            try:
+                loop.add_signal_handler(signal.SIGTERM, terminate)
+                handles_sigterm = True
+            except NotImplementedError:
+                handles_sigterm = False  # No signal handlers on Windows event loops
+
+            try:
+                await self.poll_listings()
+            except asyncio.CancelledError:
+                if not terminated:
+                    raise
+                main_task.uncancel()
+                logger.info("Received SIGTERM, shutting down.")
+            finally:
+                # Let listings already queued finish before the stages are cancelled
+                try:
+                    await asyncio.wait_for(self.pipeline.drain(), PIPELINE_DRAIN_TIMEOUT)
+                except asyncio.TimeoutError:
+                    logger.info(f"Pipeline not drained after {PIPELINE_DRAIN_TIMEOUT}s: {self.pipeline.summary()}. "
+                                f"{len(self.in_flight)} unfinished listings will be handled again after a restart.")
+                rates_refresher.cancel()
+                if archiver is not None:
+                    archiver.cancel()
+                history_snapshots.cancel()
+                if metrics_server is not None:
+                    await metrics_server.cleanup()
+                await self.pipeline.stop()
+                await self.save_state()
+                if self.shards is not None:
+                    await self.shards.stop()
+                shutdown_parse_executor()
+                await self.save_price_history()
+                # Deliver notifications that are still queued
+                await dispatcher.close()
+                if handles_sigterm:
+                    loop.remove_signal_handler(signal.SIGTERM)
+
+
+def main():
+    """Create the database if needed and run the scanner until interrupted."""
+    initialize_database()
+    asyncio.run(Scanner().run())
 
-            logger.info(f"Iteration finished, starting again in {REFRESH_RATE} seconds. Last check updated to {last_check}.")
-            await asyncio.sleep(REFRESH_RATE)  # Sleep for the refresh interval
 
 if __name__ == "__main__":
-    initialize_database()
-    asyncio.run(check_new_listings())
\ No newline at end of file
+    main()
@@ -0,0 +1,38 @@
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# The modules read their configuration at import time, so point it at throwaway files and a
+# local port before any test imports them
+WORK_DIR = tempfile.mkdtemp(prefix="gg-tests-")
+MOCK_PORT = _free_port()
+
+with open(os.path.join(WORK_DIR, "exchange_rates.json"), "w") as file:
+    json.dump({"last_updated": datetime.now().isoformat(), "eur_to_usd": 1.05, "usd_to_pln": 4.0}, file)
+with open(os.path.join(WORK_DIR, "gg_session.json"), "w") as file:
+    json.dump({"gg_session": "mock-session", "gg_csrf": "mock-csrf", "csrf_token": "mock-token",
+               "expires_at": time.time() + 86400}, file)
+
+os.environ.update({
+    "BASE_URL": f"http://127.0.0.1:{MOCK_PORT}",
+    "DB_FILE": os.path.join(WORK_DIR, "tests.db"),
+    "CACHE_FILE": os.path.join(WORK_DIR, "exchange_rates.json"),
+    "SESSION_FILE": os.path.join(WORK_DIR, "gg_session.json"),
+    "ARCHIVE_DIR": os.path.join(WORK_DIR, "archive"),
+    "LOG_FILE": os.path.join(WORK_DIR, "main.log"),
+})
+os.chdir(REPO_ROOT)  # settings.ini is read relative to the working directory
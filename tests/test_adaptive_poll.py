@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta, timezone
+
+from modules.adaptive_poll import AdaptiveInterval
+
+
+def poll(interval, now, until, arrivals):
+    """Poll from `now` to `until`, feeding the arrivals each tick sees; returns the intervals used."""
+    intervals = []
+    seen = 0
+    while now < until:
+        new = [arrival for arrival in arrivals[seen:] if arrival <= now]
+        seen += len(new)
+        interval.observe(new, now)
+        intervals.append(interval.interval)
+        now += timedelta(seconds=interval.interval)
+    return now, intervals
+
+
+def test_interval_shortens_on_the_first_tick_after_a_long_quiet_period():
+    interval = AdaptiveInterval(30, 5, 120, 0.2)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    interval.observe([start], start)
+
+    now, quiet = poll(interval, start, start + timedelta(hours=8), [])
+    assert quiet[-1] > 110
+    assert interval.mean_gap <= 120
+
+    # A burst of one deal every 10 seconds
+    burst = [now + timedelta(seconds=10 * number) for number in range(1, 100)]
+    _, intervals = poll(interval, now + timedelta(seconds=120), now + timedelta(seconds=600), burst)
+    assert intervals[0] < 30
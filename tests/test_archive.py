@@ -0,0 +1,53 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from modules import archive
+from modules.archive import compact_listings, open_archive
+from modules.database import get_connection, initialize_database
+
+
+def insert_old_listings(count):
+    initialize_database()
+    conn = get_connection()
+    with conn:
+        conn.execute("DELETE FROM listings")
+        conn.executemany(
+            "INSERT INTO listings (game_id, name, drm, price, created_at, url) VALUES (?, ?, ?, ?, ?, ?)",
+            [(f"{700 + number % 3}", f"Game {number}", "Steam", 10.0 + number, f"2020-01-01 00:00:{number:02d}",
+              f"/game/{number}/") for number in range(count)]
+        )
+    return conn
+
+
+def test_failed_delete_is_finished_by_the_next_compaction(tmp_path):
+    conn = insert_old_listings(5)
+    conn.execute("CREATE TEMP TRIGGER block_delete BEFORE DELETE ON listings BEGIN SELECT RAISE(ABORT, 'locked'); END")
+    with pytest.raises(sqlite3.Error):
+        compact_listings(30, archive_dir=str(tmp_path))
+    conn.execute("DROP TRIGGER block_delete")
+
+    assert compact_listings(30, archive_dir=str(tmp_path)) == 0
+    assert len(open_archive(str(tmp_path))) == 5
+    assert conn.execute("SELECT COUNT(*) FROM listings").fetchone()[0] == 0
+
+
+def test_archiver_keeps_running_after_a_database_error(monkeypatch):
+    calls = []
+
+    def locked(older_than_days):
+        calls.append(older_than_days)
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(archive, "compact_listings", locked)
+    monkeypatch.setattr(archive, "ARCHIVE_INTERVAL_SECONDS", 0.01)
+
+    async def scenario():
+        archiver = asyncio.create_task(archive.run_archiver())
+        await asyncio.sleep(0.1)
+        assert not archiver.done()
+        archiver.cancel()
+
+    asyncio.run(scenario())
+    assert len(calls) > 1
@@ -0,0 +1,88 @@
+import asyncio
+import time
+from urllib.parse import urlparse
+
+from aiohttp import web
+
+from modules.config import BASE_URL
+from modules.discord_notification import DiscordDispatcher
+from modules.http_client import create_session
+
+MOCK_PORT = urlparse(BASE_URL).port
+WEBHOOK_URL = f"http://127.0.0.1:{MOCK_PORT}/webhook"
+
+RETRY_AFTER = 0.3
+RESET_AFTER = 0.3
+
+
+class FakeWebhook:
+    """A webhook answering with the queued (status, headers, body) responses, then 204s."""
+
+    def __init__(self, responses=()):
+        self.responses = list(responses)
+        self.requests = []  # (time, status, embed count)
+
+    async def handle(self, request):
+        body = await request.json()
+        status, headers, payload = self.responses.pop(0) if self.responses else (204, {}, None)
+        self.requests.append((time.monotonic(), status, len(body["embeds"])))
+        if payload is not None:
+            return web.json_response(payload, status=status, headers=headers)
+        return web.Response(status=status, headers=headers)
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/webhook", self.handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", MOCK_PORT).start()
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+
+def make_embed(number, value_length=10):
+    return {"title": f"Game {number}", "url": f"/game/{number}/", "fields": [{"name": "Price", "value": "x" * value_length}]}
+
+
+async def deliver(webhook, embeds):
+    """Queue every embed at once, then close the dispatcher, which delivers all of them first."""
+    await webhook.start()
+    try:
+        async with create_session() as session:
+            dispatcher = DiscordDispatcher(WEBHOOK_URL)
+            dispatcher.start(session)
+            for embed in embeds:
+                dispatcher.enqueue(embed)
+            await asyncio.wait_for(dispatcher.close(), 10)
+            return dispatcher
+    finally:
+        await webhook.stop()
+
+
+def test_rate_limits_are_waited_out_and_embeds_packed_by_ten():
+    webhook = FakeWebhook([
+        (429, {}, {"retry_after": RETRY_AFTER, "global": False}),
+        (204, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": str(RESET_AFTER)}, None),
+    ])
+
+    dispatcher = asyncio.run(deliver(webhook, [make_embed(number) for number in range(25)]))
+
+    (limited_at, limited, _), (retried_at, *_), (second_at, *_), _ = webhook.requests
+    assert limited == 429
+    assert [count for _, status, count in webhook.requests if status == 204] == [10, 10, 5]
+    assert retried_at - limited_at >= RETRY_AFTER
+    assert second_at - retried_at >= RESET_AFTER
+    assert dispatcher.stats == {"queued": 25, "sent": 25, "messages": 3, "rate_limited": 1, "failed": 0}
+    assert dispatcher.queue_depth == 0
+
+
+def test_embeds_over_the_character_limit_are_carried_to_the_next_message():
+    webhook = FakeWebhook()
+    # Two of these fit into 6000 characters, three do not
+    embeds = [make_embed(number, value_length=2500) for number in range(5)]
+
+    dispatcher = asyncio.run(deliver(webhook, embeds))
+
+    assert [count for _, _, count in webhook.requests] == [2, 2, 1]
+    assert dispatcher.stats["sent"] == 5 and dispatcher.stats["messages"] == 3
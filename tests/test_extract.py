@@ -0,0 +1,59 @@
+import re
+
+import pytest
+
+from benchmarks.parse_bench import (
+    USD_TO_PLN,
+    fixture_pages,
+    legacy_extract_drm_from_listing,
+    legacy_extract_keyshops,
+    legacy_extract_listing_details,
+    legacy_extract_listings
+)
+from modules.config import BASE_URL
+from modules.extract import (
+    extract_drm_from_listing,
+    extract_keyshops,
+    extract_listing_details,
+    extract_listings
+)
+
+LIST_PAGES = fixture_pages("list")
+KEYSHOP_PAGES = fixture_pages("keyshops")
+
+
+def keyshop_drms(html_content):
+    return sorted(set(re.findall(r'<svg[^>]*title="A ([^"]+)"', html_content.decode())))
+
+
+@pytest.mark.parametrize("name", sorted(LIST_PAGES))
+def test_extract_listings_matches_legacy_path(name):
+    html_content = LIST_PAGES[name]
+    legacy = legacy_extract_listings(html_content, USD_TO_PLN, BASE_URL)
+    current = extract_listings(html_content, USD_TO_PLN)
+
+    assert legacy
+    assert [{key: value for key, value in listing.items() if key != "listed_price"} for listing in current] == legacy
+    assert all(listing["listed_price"] * USD_TO_PLN == listing["current_price"] for listing in current)
+
+
+@pytest.mark.parametrize("name", sorted(LIST_PAGES))
+def test_listing_helpers_match_legacy_helpers(name):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(LIST_PAGES[name], "html.parser")
+    for listing in soup.find_all("div", class_="hoverable-box"):
+        listing_html = str(listing)
+        assert extract_drm_from_listing(listing_html) == legacy_extract_drm_from_listing(listing_html)
+        assert extract_listing_details(listing_html) == legacy_extract_listing_details(listing_html, BASE_URL)
+
+
+@pytest.mark.parametrize("name", sorted(KEYSHOP_PAGES))
+def test_extract_keyshops_matches_legacy_path(name):
+    html_content = KEYSHOP_PAGES[name]
+    drms = keyshop_drms(html_content)
+
+    assert drms
+    assert any(extract_keyshops(html_content, drm) for drm in drms)
+    for drm in drms + ["No Such DRM"]:
+        assert extract_keyshops(html_content, drm) == legacy_extract_keyshops(html_content, drm)
@@ -0,0 +1,159 @@
+import asyncio
+import re
+from urllib.parse import urlparse
+
+from aiohttp import web
+
+import scanner
+from benchmarks.mock_server import MockGGDeals
+from benchmarks.parse_bench import fixture_pages
+from modules.adaptive_poll import AdaptiveInterval
+from modules.config import BASE_URL
+from modules.http_client import create_session
+
+MOCK_PORT = urlparse(BASE_URL).port
+
+LIST_PAGE = next(iter(fixture_pages("list").values())).decode()
+LIST_REGION = LIST_PAGE[LIST_PAGE.index("<body"):]
+
+
+class NoisyListPage:
+    """A list page without ETags whose markup outside the listings changes on every request."""
+
+    def __init__(self):
+        self.region = LIST_REGION
+        self.requests = 0
+
+    async def handle_list(self, request):
+        self.requests += 1
+        page = int(request.query.get("page", 1))
+        body = self.region if page == 1 else "<body></body>"
+        return web.Response(
+            text=f'<html><head><meta name="csrf-token" content="token-{self.requests}"></head>{body}</html>',
+            content_type="text/html"
+        )
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/deals/new-deals/", self.handle_list)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", MOCK_PORT).start()
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+
+class RecordingPipeline:
+    def __init__(self):
+        self.batches = []
+
+    async def put(self, listings):
+        self.batches.append(listings)
+
+    def summary(self):
+        return "recording"
+
+
+def count_parses(monkeypatch):
+    calls = []
+    parse_listings = scanner.parse_listings
+
+    async def counting_parse_listings(html_content, usd_to_pln):
+        calls.append(html_content)
+        return await parse_listings(html_content, usd_to_pln)
+
+    monkeypatch.setattr(scanner, "parse_listings", counting_parse_listings)
+    return calls
+
+
+def publish_next(server):
+    """Make the mock server publish one more listing on its next request."""
+    server._started -= 1 / server.arrival_rate
+
+
+async def with_scanner(server, scenario):
+    await server.start(port=MOCK_PORT) if isinstance(server, MockGGDeals) else await server.start()
+    try:
+        async with create_session() as session:
+            deals_scanner = scanner.Scanner()
+            deals_scanner.session = session
+            return await scenario(deals_scanner)
+    finally:
+        await server.stop()
+
+
+def test_not_modified_response_skips_parsing(monkeypatch):
+    parses = count_parses(monkeypatch)
+    server = MockGGDeals(arrival_rate=1e-6)
+
+    async def scenario(deals_scanner):
+        first = await deals_scanner.fetch_listings()
+        parsed = len(parses)
+        second = await deals_scanner.fetch_listings()
+        return first, parsed, second
+
+    first, parsed, second = asyncio.run(with_scanner(server, scenario))
+    assert len(first) == 1
+    assert second is None
+    assert len(parses) == parsed
+    assert server.requests["not_modified"] == 1
+
+
+def test_identical_listing_region_skips_on_digest(monkeypatch):
+    parses = count_parses(monkeypatch)
+    server = NoisyListPage()
+
+    async def scenario(deals_scanner):
+        first = await deals_scanner.fetch_listings()
+        parsed = len(parses)
+        second = await deals_scanner.fetch_listings()
+        return first, parsed, second
+
+    first, parsed, second = asyncio.run(with_scanner(server, scenario))
+    assert first
+    assert second is None
+    assert len(parses) == parsed
+
+
+def test_changed_listing_region_is_processed(monkeypatch):
+    parses = count_parses(monkeypatch)
+    server = NoisyListPage()
+
+    async def scenario(deals_scanner):
+        await deals_scanner.fetch_listings()
+        parsed = len(parses)
+        price = re.search(r'da-value="([^"]*)"', server.region).group(1)
+        server.region = server.region.replace(f'da-value="{price}"', f'da-value="{float(price) + 1:.2f}"', 1)
+        return parsed, await deals_scanner.fetch_listings()
+
+    parsed, listings = asyncio.run(with_scanner(server, scenario))
+    assert listings is not None
+    assert len(parses) > parsed
+
+
+def test_tick_stats_count_skipped_and_processed_ticks():
+    server = MockGGDeals(arrival_rate=1e-6)
+    pipeline = RecordingPipeline()
+
+    async def scenario(deals_scanner):
+        deals_scanner.pipeline = pipeline
+        deals_scanner.poll_interval = AdaptiveInterval(0.05, 0.05, 0.05, 0.0)
+
+        async def publish_later():
+            await asyncio.sleep(0.5)
+            publish_next(server)
+
+        publisher = asyncio.create_task(publish_later())
+        try:
+            await asyncio.wait_for(deals_scanner.poll_listings(), 1.0)
+        except asyncio.TimeoutError:
+            pass
+        await publisher
+        return deals_scanner.tick_stats
+
+    tick_stats = asyncio.run(with_scanner(server, scenario))
+    assert tick_stats["processed"] == 2
+    assert tick_stats["skipped"] == server.requests["not_modified"]
+    assert tick_stats["skipped"] >= 5
+    assert [len(batch) for batch in pipeline.batches] == [1, 2]
@@ -0,0 +1,139 @@
+import asyncio
+import os
+import signal
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse
+
+import scanner
+from benchmarks.mock_server import MockGGDeals
+from modules.adaptive_poll import AdaptiveInterval
+from modules.config import BASE_URL
+from modules.database import get_connection, initialize_database
+
+MOCK_PORT = urlparse(BASE_URL).port
+
+FEED_URL = "https://gg.deals/deals/new-deals/"
+
+
+def make_listings(count):
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "game_id": f"{500 + number}", "game_name": f"Game {number}", "drm": "Steam", "feed": FEED_URL,
+            "listing_url": f"/listing/{number}/", "listed_price": 10.0 + number, "current_price": 40.0 + number,
+            "listing_time": now - timedelta(seconds=number),
+        }
+        for number in range(count)
+    ]
+
+
+def reset_state():
+    initialize_database()
+    conn = get_connection()
+    with conn:
+        conn.execute("DELETE FROM seen_listings")
+        conn.execute("DELETE FROM feed_watermarks")
+
+
+async def run_pipeline(fetch_keyshops, listings, drain):
+    """Push listings through a scanner's pipeline and stop it the way run() does."""
+    deals_scanner = scanner.Scanner()
+    deals_scanner.fetch_keyshops = fetch_keyshops
+    await deals_scanner.load_state()
+    deals_scanner.pipeline = deals_scanner.build_pipeline()
+    deals_scanner.pipeline.start()
+    await deals_scanner.pipeline.put(listings)
+    if drain:
+        await asyncio.wait_for(deals_scanner.pipeline.drain(), 5)
+    else:
+        await asyncio.sleep(0.2)
+    await deals_scanner.pipeline.stop()
+    await deals_scanner.save_state()
+    return deals_scanner
+
+
+async def restarted_scanner():
+    deals_scanner = scanner.Scanner()
+    await deals_scanner.load_state()
+    return deals_scanner
+
+
+def test_unfinished_listings_are_handled_again_after_a_restart():
+    reset_state()
+    listings = make_listings(5)
+
+    async def never_answers(game_id, drm, priority=1.0):
+        await asyncio.Event().wait()
+
+    async def scenario():
+        first = await run_pipeline(never_answers, listings, drain=False)
+        assert len(first.in_flight) == len(listings)
+        return await restarted_scanner()
+
+    restarted = asyncio.run(scenario())
+    assert all(restarted.is_new(listing) for listing in listings)
+    assert restarted.watermark(FEED_URL) <= min(listing["listing_time"] for listing in listings)
+
+
+def test_finished_listings_are_not_handled_again_after_a_restart():
+    reset_state()
+    listings = make_listings(5)
+
+    async def no_keyshops(game_id, drm, priority=1.0):
+        return None
+
+    async def scenario():
+        first = await run_pipeline(no_keyshops, listings, drain=True)
+        assert not first.in_flight
+        return await restarted_scanner()
+
+    restarted = asyncio.run(scenario())
+    assert not any(restarted.is_new(listing) for listing in listings)
+    assert restarted.watermark(FEED_URL) == max(listing["listing_time"] for listing in listings)
+
+
+def test_sigterm_drains_the_pipeline_and_saves_the_state():
+    reset_state()
+    server = MockGGDeals(arrival_rate=5, seed=1)
+
+    async def scenario():
+        await server.start(port=MOCK_PORT)
+        try:
+            deals_scanner = scanner.Scanner()
+            deals_scanner.metrics_port = 0
+            deals_scanner.sound_profit = float("inf")
+            deals_scanner.poll_interval = AdaptiveInterval(0.2, 0.2, 0.2, 0.0)
+            running = asyncio.create_task(deals_scanner.run())
+            await asyncio.sleep(2)
+            os.kill(os.getpid(), signal.SIGTERM)
+            await asyncio.wait_for(running, 30)
+            return deals_scanner, await restarted_scanner()
+        finally:
+            await server.stop()
+
+    stopped, restarted = asyncio.run(scenario())
+    assert stopped.seen_listings
+    assert not stopped.in_flight and not stopped.finished
+    assert list(restarted.seen_listings) == list(stopped.seen_listings)
+
+
+def test_skipped_ticks_save_listings_that_finished_since():
+    reset_state()
+    listings = make_listings(3)
+
+    async def unchanged_page():
+        return None
+
+    async def scenario():
+        deals_scanner = scanner.Scanner()
+        deals_scanner.fetch_listings = unchanged_page
+        deals_scanner.poll_interval = AdaptiveInterval(0.05, 0.05, 0.05, 0.0)
+        await deals_scanner.filter_listings([listings])
+        deals_scanner.finish_listings(listings)
+        polling = asyncio.create_task(deals_scanner.poll_listings())
+        await asyncio.sleep(0.2)
+        polling.cancel()
+        return await restarted_scanner()
+
+    restarted = asyncio.run(scenario())
+    assert not any(restarted.is_new(listing) for listing in listings)
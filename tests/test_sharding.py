@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+from modules import sharding
+from modules.sharding import KeyshopShards
+
+
+def failing_worker(worker_id, jobs, results):
+    raise RuntimeError("Could not get session credentials")
+
+
+def silent_worker(worker_id, jobs, results):
+    while jobs.get() is not None:
+        pass
+
+
+class FailingShards(KeyshopShards):
+    worker_main = staticmethod(failing_worker)
+
+
+class SilentShards(KeyshopShards):
+    worker_main = staticmethod(silent_worker)
+
+
+async def check_until(shards, condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        shards.check_workers()
+        await asyncio.sleep(0.1)
+
+
+def test_worker_that_keeps_failing_is_given_up(monkeypatch):
+    monkeypatch.setattr(sharding, "WORKER_MAX_RESTARTS", 2)
+    monkeypatch.setattr(sharding, "WORKER_RESTART_BACKOFF_BASE", 0.0)
+
+    async def scenario():
+        shards = FailingShards(1, job_timeout=60)
+        shards.start()
+        try:
+            lookup = asyncio.create_task(shards.fetch("100", "Steam"))
+            await check_until(shards, lookup.done)
+            return await lookup, await shards.fetch("100", "Steam"), shards.collect_stats()[0]
+        finally:
+            await shards.stop()
+
+    first, later, stats = asyncio.run(scenario())
+    assert first is None and later is None
+    assert stats["given_up"] and stats["restarts"] == 2 and stats["pending"] == 0
+
+
+def test_unanswered_job_times_out():
+    async def scenario():
+        shards = SilentShards(1, job_timeout=0.5)
+        shards.start()
+        try:
+            started = time.monotonic()
+            return await shards.fetch("100", "Steam"), time.monotonic() - started, shards.collect_stats()[0]
+        finally:
+            await shards.stop()
+
+    result, elapsed, stats = asyncio.run(scenario())
+    assert result is None and elapsed < 5
+    assert stats["timeouts"] == 1 and stats["pending"] == 0